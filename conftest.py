@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def shared_cache_in_tempdir():
+    """pytest держит общий кэш во временном каталоге, как manage.py test."""
+    from core.test_runner import temp_shared_cache
+
+    with temp_shared_cache():
+        yield
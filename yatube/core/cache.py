@@ -0,0 +1,265 @@
+import os
+import pickle
+import secrets
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+
+GENERATION_KEY = 'two_tier:generation'
+MISSING = object()
+
+
+def new_generation():
+    """Уникальное поколение, как версии page_cache: incr L2 не атомарен."""
+    return f'{time.time_ns()}-{secrets.token_hex(4)}'
+
+
+class FileCache(FileBasedCache):
+    """
+    FileBasedCache с атомарным add: файл ключа появляется жёсткой
+    ссылкой, которая не заменяет уже созданный другим процессом.
+    На add держатся межпроцессные блокировки core.single_flight.
+    """
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if self.has_key(key, version):
+            return False
+        self._createdir()
+        fname = self._key_to_file(key, version)
+        self._cull()
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, 'wb') as f:
+                self._write_content(f, timeout, value)
+            os.link(tmp_path, fname)
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+        return True
+
+
+class TwoTierCache(BaseCache):
+    """
+    Двухуровневый кэш: L1 - LRU в памяти процесса, ограниченный
+    числом записей и объёмом, L2 - общий для всех процессов
+    бэкенд из CACHES под псевдонимом OPTIONS['L2'].
+
+    В L1 попадают только ключи с префиксами L1_KEY_PREFIXES. Значение
+    под таким ключом не должно меняться: хэш содержимого входит
+    в ключ (карточки), либо значение само проверяет свою актуальность
+    (кэш страниц гостей). Всё прочее, в том числе счётчики версий
+    и страницы page_cache, ключ которых не зависит от версий,
+    читается только из L2, поэтому сброс версий в одном процессе
+    сразу виден всем.
+
+    Удаление и очистка таких ключей увеличивают поколение в L2;
+    процессы сверяют поколение не чаще раза в SYNC_INTERVAL секунд
+    и отбрасывают записи L1 прежних поколений.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l2_alias = options.get('L2', 'shared')
+        self.l1_max_entries = options.get('L1_MAX_ENTRIES', 1000)
+        self.l1_max_bytes = options.get('L1_MAX_BYTES', 32 * 2 ** 20)
+        self.l1_timeout = options.get('L1_TIMEOUT', 300)
+        self.l1_key_prefixes = tuple(options.get('L1_KEY_PREFIXES', ()))
+        self.sync_interval = options.get('SYNC_INTERVAL', 1)
+        self._l1 = OrderedDict()
+        self._l1_bytes = 0
+        self._lock = threading.Lock()
+        self._generation = None
+        self._synced_at = 0
+        self._stats = {
+            'l1': {'hits': 0, 'misses': 0},
+            'l2': {'hits': 0, 'misses': 0},
+        }
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def is_local(self, key):
+        return key.startswith(self.l1_key_prefixes)
+
+    def stats(self):
+        """Попадания и промахи по уровням для текущего процесса."""
+        with self._lock:
+            return {
+                'l1': {
+                    **self._stats['l1'],
+                    'entries': len(self._l1),
+                    'bytes': self._l1_bytes,
+                },
+                'l2': dict(self._stats['l2']),
+            }
+
+    def _count(self, tier, hit):
+        with self._lock:
+            self._stats[tier]['hits' if hit else 'misses'] += 1
+
+    def generation(self):
+        """Поколение L1, сверяемое с L2 не чаще SYNC_INTERVAL."""
+        now = time.monotonic()
+        if self._generation is None or (
+            now - self._synced_at >= self.sync_interval
+        ):
+            generation = self.l2.get(GENERATION_KEY)
+            if generation is None:
+                self.l2.add(GENERATION_KEY, new_generation(), None)
+                generation = self.l2.get(GENERATION_KEY)
+            self._generation, self._synced_at = generation, now
+        return self._generation
+
+    def invalidate(self):
+        """Делает записи L1 всех процессов устаревшими."""
+        generation = new_generation()
+        self.l2.set(GENERATION_KEY, generation, None)
+        with self._lock:
+            self._l1.clear()
+            self._l1_bytes = 0
+        self._generation, self._synced_at = generation, time.monotonic()
+
+    def _l1_get(self, key, version):
+        full_key = self.make_key(key, version)
+        generation = self.generation()
+        with self._lock:
+            entry = self._l1.get(full_key)
+            if entry is not None:
+                data, expires_at, entry_generation = entry
+                if (
+                    entry_generation == generation
+                    and expires_at > time.monotonic()
+                ):
+                    self._l1.move_to_end(full_key)
+                    self._stats['l1']['hits'] += 1
+                    return pickle.loads(data)
+                self._l1_forget(full_key)
+            self._stats['l1']['misses'] += 1
+        return MISSING
+
+    def _l1_set(self, key, value, timeout, version):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is not None:
+            timeout = min(timeout - time.time(), self.l1_timeout)
+        else:
+            timeout = self.l1_timeout
+        full_key = self.make_key(key, version)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        generation = self.generation()
+        with self._lock:
+            self._l1_forget(full_key)
+            if timeout <= 0 or len(data) > self.l1_max_bytes:
+                return
+            self._l1[full_key] = (
+                data, time.monotonic() + timeout, generation
+            )
+            self._l1_bytes += len(data)
+            while (
+                len(self._l1) > self.l1_max_entries
+                or self._l1_bytes > self.l1_max_bytes
+            ):
+                _, (evicted, _, _) = self._l1.popitem(last=False)
+                self._l1_bytes -= len(evicted)
+
+    def _l1_forget(self, full_key):
+        entry = self._l1.pop(full_key, None)
+        if entry is not None:
+            self._l1_bytes -= len(entry[0])
+
+    def get(self, key, default=None, version=None):
+        if self.is_local(key):
+            value = self._l1_get(key, version)
+            if value is not MISSING:
+                return value
+        value = self.l2.get(key, MISSING, version)
+        self._count('l2', value is not MISSING)
+        if value is MISSING:
+            return default
+        if self.is_local(key):
+            self._l1_set(key, value, self.l1_timeout, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        for key in keys:
+            if self.is_local(key):
+                value = self._l1_get(key, version)
+                if value is not MISSING:
+                    found[key] = value
+        rest = [key for key in keys if key not in found]
+        if rest:
+            fetched = self.l2.get_many(rest, version)
+            with self._lock:
+                self._stats['l2']['hits'] += len(fetched)
+                self._stats['l2']['misses'] += len(rest) - len(fetched)
+            for key, value in fetched.items():
+                if self.is_local(key):
+                    self._l1_set(key, value, self.l1_timeout, version)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        self.l2.set(key, value, timeout, version)
+        if self.is_local(key):
+            self._l1_set(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        failed = self.l2.set_many(data, timeout, version)
+        for key, value in data.items():
+            if self.is_local(key) and key not in failed:
+                self._l1_set(key, value, timeout, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        added = self.l2.add(key, value, timeout, version)
+        if added and self.is_local(key):
+            self._l1_set(key, value, timeout, version)
+        return added
+
+    def has_key(self, key, version=None):
+        if self.is_local(key) and self._l1_get(key, version) is not MISSING:
+            return True
+        return self.l2.has_key(key, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return self.l2.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.l2.delete(key, version)
+        if self.is_local(key):
+            self.invalidate()
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.l2.delete_many(keys, version)
+        if any(self.is_local(key) for key in keys):
+            self.invalidate()
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version)
+        if self.is_local(key):
+            self.invalidate()
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version)
+
+    def clear(self):
+        self.l2.clear()
+        self.invalidate()
@@ -0,0 +1,111 @@
+import math
+import random
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+LOCK_KEY = 'lock:{}'
+
+# Значение в кэше: когда оно устаревает, сколько секунд
+# занял его расчёт и метка (например, версии областей page_cache),
+# при несовпадении которой значение считается устаревшим
+Entry = namedtuple('Entry', ('value', 'expires_at', 'delta', 'stamp'))
+
+
+def get_entry(key):
+    entry = cache.get(key)
+    return entry if isinstance(entry, Entry) else None
+
+
+def is_fresh(entry, stamp=None, beta=None):
+    """
+    Вероятностный досрочный пересчёт (XFetch): чем ближе срок
+    и дольше расчёт, тем вероятнее, что запрос сочтёт запись
+    устаревшей и пересчитает её до истечения.
+    """
+    if entry.stamp != stamp:
+        return False
+    if beta is None:
+        beta = settings.SINGLE_FLIGHT_BETA
+    early = entry.delta * beta * -math.log(1 - random.random())
+    return time.time() + early < entry.expires_at
+
+
+def acquire(key):
+    """
+    Межпроцессная блокировка через add общего кэша.
+    Возвращает токен владельца или None, если блокировка занята.
+    """
+    token = uuid.uuid4().hex
+    if cache.add(
+        LOCK_KEY.format(key), token, settings.SINGLE_FLIGHT_LOCK_TIMEOUT
+    ):
+        return token
+    return None
+
+
+def release(key, token):
+    lock_key = LOCK_KEY.format(key)
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def wait_for(key, stamp):
+    """Ждёт, пока значение пересчитает владелец блокировки."""
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(settings.SINGLE_FLIGHT_POLL_INTERVAL)
+        entry = get_entry(key)
+        if entry is not None and entry.stamp == stamp:
+            return entry
+        if not cache.has_key(LOCK_KEY.format(key)):
+            return None
+    return None
+
+
+def get_or_recompute(key, compute, timeout, stamp=None, cacheable=None):
+    """
+    Значение из кэша с защитой от лавины пересчётов.
+
+    Устаревшее значение пересчитывает один запрос - владелец
+    блокировки, остальные тем временем получают прежнее. Если
+    прежнего нет, остальные ждут пересчёта до SINGLE_FLIGHT_WAIT
+    секунд и лишь затем считают сами. Запись живёт в кэше на
+    SINGLE_FLIGHT_STALE_TIMEOUT дольше timeout, чтобы было что отдать.
+    cacheable(value) решает, можно ли класть результат в кэш.
+    """
+    entry = get_entry(key)
+    if entry is not None and is_fresh(entry, stamp):
+        return entry.value
+    token = acquire(key)
+    if token is None:
+        if entry is not None:
+            return entry.value
+        entry = wait_for(key, stamp)
+        if entry is not None:
+            return entry.value
+    try:
+        started = time.time()
+        value = compute()
+        if cacheable is None or cacheable(value):
+            finished = time.time()
+            cache.set(
+                key,
+                Entry(value, finished + timeout, finished - started, stamp),
+                timeout + settings.SINGLE_FLIGHT_STALE_TIMEOUT
+            )
+        return value
+    finally:
+        if token is not None:
+            release(key, token)
+
+
+def values(entries):
+    """Значения записей из get_many, в том числе устаревших."""
+    return {
+        key: entry.value for key, entry in entries.items()
+        if isinstance(entry, Entry)
+    }
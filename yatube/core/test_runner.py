@@ -0,0 +1,37 @@
+import copy
+import shutil
+import tempfile
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+@contextmanager
+def temp_shared_cache():
+    """
+    Общий кэш во временном каталоге на время блока,
+    чтобы тесты не читали и не портили BASE_DIR/cache.
+    """
+    cache_dir = tempfile.mkdtemp(prefix='yatube-cache-')
+    caches = copy.deepcopy(settings.CACHES)
+    caches['shared']['LOCATION'] = cache_dir
+    try:
+        with override_settings(CACHES=caches):
+            yield cache_dir
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+class TempCacheRunner(DiscoverRunner):
+    """Запускает тесты с общим кэшем во временном каталоге."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_context = ExitStack()
+        self.cache_context.enter_context(temp_shared_cache())
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_context.close()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,104 @@
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from core.cache import FileCache, TwoTierCache
+
+TWO_TIER = {
+    'BACKEND': 'core.cache.TwoTierCache',
+    'OPTIONS': {
+        'L2': 'shared',
+        'L1_MAX_ENTRIES': 2,
+        'L1_KEY_PREFIXES': ('local:',),
+        'SYNC_INTERVAL': 0,
+    },
+}
+
+
+@override_settings(CACHES={
+    'default': TWO_TIER,
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'two-tier-tests',
+    },
+})
+class TestTwoTierCache(SimpleTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        # Два экземпляра над одним L2 - как два процесса
+        self.cache = TwoTierCache('', TWO_TIER)
+        self.other = TwoTierCache('', TWO_TIER)
+        self.cache.clear()
+
+    def test_l1_hit(self):
+        """Повторное чтение берётся из L1 без обращения к L2"""
+        self.cache.set('local:key', {'value': 1})
+        self.cache.get('local:key')['value'] = 2
+        self.assertEqual(self.cache.get('local:key'), {'value': 1})
+        stats = self.cache.stats()
+        self.assertEqual(stats['l1']['hits'], 2)
+        self.assertEqual(stats['l2'], {'hits': 0, 'misses': 0})
+
+    def test_other_keys_skip_l1(self):
+        """Ключи без префикса L1 читаются только из L2"""
+        self.cache.set('counter', 1)
+        self.cache.incr('counter')
+        self.assertEqual(self.other.get('counter'), 2)
+        self.assertEqual(self.cache.stats()['l1']['entries'], 0)
+
+    def test_shared_between_processes(self):
+        """Значение одного процесса видно другому через L2"""
+        self.cache.set('local:key', 'value')
+        self.assertEqual(self.other.get('local:key'), 'value')
+        self.assertEqual(self.other.stats()['l2']['hits'], 1)
+        self.assertEqual(self.other.get('local:key'), 'value')
+        self.assertEqual(self.other.stats()['l1']['hits'], 1)
+
+    def test_delete_reaches_other_l1(self):
+        """Удаление в одном процессе сбрасывает L1 других"""
+        self.cache.set('local:key', 'value')
+        self.other.get('local:key')
+        self.cache.delete('local:key')
+        self.assertIsNone(self.other.get('local:key'))
+
+    def test_invalidate_sets_new_generation(self):
+        """Каждый сброс L1 записывает в L2 новое поколение"""
+        generations = set()
+        for _ in range(3):
+            self.cache.invalidate()
+            generations.add(self.other.generation())
+        self.assertEqual(len(generations), 3)
+
+    def test_lru_eviction(self):
+        """L1 вытесняет давно не читанные записи"""
+        self.cache.set('local:a', 1)
+        self.cache.set('local:b', 2)
+        self.cache.get('local:a')
+        self.cache.set('local:c', 3)
+        self.assertEqual(self.cache.stats()['l1']['entries'], 2)
+        self.assertEqual(
+            self.cache.get_many(['local:a', 'local:b', 'local:c']),
+            {'local:a': 1, 'local:b': 2, 'local:c': 3}
+        )
+        self.assertEqual(self.cache.stats()['l2']['hits'], 1)
+
+
+class TestFileCache(SimpleTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.cache = FileCache(self.directory, {})
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+        super().tearDown()
+
+    def test_add_does_not_replace(self):
+        """add не заменяет существующий ключ, истёкший - заменяет"""
+        self.assertTrue(self.cache.add('lock', 'first', 60))
+        self.assertFalse(self.cache.add('lock', 'second', 60))
+        self.assertEqual(self.cache.get('lock'), 'first')
+        self.cache.set('expired', 'old', -1)
+        self.assertTrue(self.cache.add('expired', 'new', 60))
+        self.assertEqual(self.cache.get('expired'), 'new')
@@ -0,0 +1,88 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from core import single_flight
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'single-flight-tests',
+        },
+    },
+    SINGLE_FLIGHT_WAIT=0.2,
+    SINGLE_FLIGHT_POLL_INTERVAL=0.01,
+)
+class TestSingleFlight(SimpleTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.compute = mock.Mock(return_value='new')
+
+    def test_fresh_value(self):
+        """Свежее значение отдаётся без пересчёта"""
+        single_flight.get_or_recompute('key', lambda: 'old', 60)
+        value = single_flight.get_or_recompute('key', self.compute, 60)
+        self.assertEqual(value, 'old')
+        self.compute.assert_not_called()
+
+    def test_stamp_change_recomputes(self):
+        """Смена метки делает значение устаревшим"""
+        single_flight.get_or_recompute('key', lambda: 'old', 60, stamp=1)
+        value = single_flight.get_or_recompute(
+            'key', self.compute, 60, stamp=2
+        )
+        self.assertEqual(value, 'new')
+
+    def test_stale_served_while_locked(self):
+        """Пока пересчитывает другой, отдаётся прежнее значение"""
+        single_flight.get_or_recompute('key', lambda: 'old', 60, stamp=1)
+        token = single_flight.acquire('key')
+        value = single_flight.get_or_recompute(
+            'key', self.compute, 60, stamp=2
+        )
+        single_flight.release('key', token)
+        self.assertEqual(value, 'old')
+        self.compute.assert_not_called()
+
+    def test_not_cacheable(self):
+        """Отвергнутый cacheable результат не кладётся в кэш"""
+        single_flight.get_or_recompute(
+            'key', lambda: 'pending', 60, cacheable=lambda value: False
+        )
+        self.assertIsNone(cache.get('key'))
+
+    def test_early_recomputation(self):
+        """Долгий расчёт у конца срока пересчитывается досрочно"""
+        cache.set('key', single_flight.Entry('old', time.time() + 1, 10, None))
+        with mock.patch('random.random', return_value=0.99):
+            value = single_flight.get_or_recompute('key', self.compute, 60)
+        self.assertEqual(value, 'new')
+
+    def test_concurrent_misses_compute_once(self):
+        """Одновременные промахи пересчитывают значение один раз"""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                single_flight.get_or_recompute('key', compute, 60)
+            ))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 5)
@@ -1,9 +1,30 @@
 from django.contrib import admin
 
+from posts import counters, page_cache, search
 from posts.models import Comment, Follow, Group, Post
+from posts.paginators import EstimatedCountPaginator
 
 
-class PostAdmin(admin.ModelAdmin):
+class FullTextSearchMixin:
+    """
+    Поиск в админке через индекс FTS5 вместо LIKE '%...%'.
+    Слова ищутся по началу: «кош» находит «кошки»,
+    но подстрока из середины слова уже не находится.
+    """
+    search_table = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(pk__in=search.matching_ids(
+            self.search_table, search_term, prefix=True
+        )), False
+
+
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_table = search.POST_TABLE
     list_display = ('pk',
                     'text',
                     'pub_date',
@@ -11,10 +32,34 @@ class PostAdmin(admin.ModelAdmin):
                     'group',
                     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    actions = ('remove_from_group',)
     empty_value_display = '-пусто-'
 
+    def remove_from_group(self, request, queryset):
+        """Одним UPDATE убирает выбранные посты из групп."""
+        posts = queryset.exclude(group=None)
+        rows = list(posts.values_list(
+            'pk', 'author__username', 'group_id', 'group__slug'
+        ))
+        updated = posts.update(group=None)
+        counters.recount(Group, {row[2] for row in rows})
+        page_cache.bump_on_commit('index', *{
+            scope
+            for post_id, username, _, slug in rows
+            for scope in (
+                f'post:{post_id}', f'profile:{username}', f'group:{slug}'
+            )
+        })
+        self.message_user(request, f'Убрано из групп постов: {updated}')
+    remove_from_group.short_description = 'Убрать из группы'
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk',
@@ -27,7 +72,8 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_table = search.COMMENT_TABLE
     list_display = (
         'pk',
         'text',
@@ -36,17 +82,25 @@ class CommentAdmin(admin.ModelAdmin):
         'post'
     )
     list_editable = (
+        'text',
+    )
+    list_select_related = (
         'author',
-        'text'
+        'post'
     )
-    search_fields = (
+    autocomplete_fields = (
         'author',
-        'text'
+        'post'
+    )
+    search_fields = (
+        'text',
     )
     list_filter = (
         'pub_date',
-        'author'
     )
+    date_hierarchy = 'pub_date'
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     empty_value_display = '-пусто-'
 
 
@@ -56,18 +110,20 @@ class FollowAdmin(admin.ModelAdmin):
         'author',
         'user'
     )
-    list_editable = (
+    list_select_related = (
         'author',
         'user'
     )
-    search_fields = (
+    autocomplete_fields = (
         'author',
         'user'
     )
-    list_filter = (
-        'author',
-        'user'
+    search_fields = (
+        '=author__username',
+        '=user__username'
     )
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     empty_value_display = '-пусто-'
 
 
@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F
+
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# (модель со счётчиком, поле счётчика, считаемая модель, внешний ключ)
+COUNTERS = (
+    (Group, 'posts_count', Post, 'group_id'),
+    (Post, 'comments_count', Comment, 'post_id'),
+    (AuthorStats, 'posts_count', Post, 'author_id'),
+    (AuthorStats, 'followers_count', Follow, 'author_id'),
+    (AuthorStats, 'following_count', Follow, 'user_id'),
+)
+
+
+def real_counts(counted_model, fk, pks):
+    """Настоящие значения счётчиков для пачки объектов."""
+    rows = counted_model.objects.filter(
+        **{f'{fk}__in': pks}
+    ).order_by().values(fk).annotate(
+        total=Count('pk')
+    ).values_list(fk, 'total')
+    counts = dict.fromkeys(pks, 0)
+    counts.update(rows)
+    return counts
+
+
+def change(model, pk, field, delta):
+    """
+    Атомарно меняет счётчик на delta одним UPDATE.
+    Счётчик не уходит ниже нуля, расхождения чинит reconcile().
+    """
+    if pk is None:
+        return
+    counter = model.objects.filter(pk=pk)
+    if delta < 0:
+        counter = counter.filter(**{f'{field}__gte': -delta})
+    counter.update(**{field: F(field) + delta})
+
+
+def recount(model, pks):
+    """Пересчитывает все счётчики model для объектов pks."""
+    pks = list(pks)
+    if not pks:
+        return
+    for counter_model, field, counted_model, fk in COUNTERS:
+        if counter_model is model:
+            model.objects.bulk_update(
+                [
+                    model(pk=pk, **{field: total})
+                    for pk, total in real_counts(
+                        counted_model, fk, pks).items()
+                ],
+                [field]
+            )
+
+
+def create_author_stats(user_ids):
+    """Создаёт недостающие счётчики пользователей по реальным данным."""
+    stats = {user_id: AuthorStats(user_id=user_id) for user_id in user_ids}
+    for model, field, counted_model, fk in COUNTERS:
+        if model is AuthorStats:
+            for user_id, total in real_counts(
+                    counted_model, fk, user_ids).items():
+                setattr(stats[user_id], field, total)
+    AuthorStats.objects.bulk_create(stats.values(), ignore_conflicts=True)
+
+
+def reconcile(batch_size=1000, dry_run=False):
+    """
+    Сверяет счётчики с реальными COUNT пачками по первичному ключу
+    и исправляет расхождения. Возвращает число исправленных строк,
+    включая недостающие счётчики пользователей.
+    """
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True
+    )
+    if dry_run:
+        repaired = missing.count()
+    else:
+        repaired = 0
+        user_ids = list(missing[:batch_size])
+        while user_ids:
+            create_author_stats(user_ids)
+            repaired += len(user_ids)
+            user_ids = list(missing[:batch_size])
+
+    for model, field, counted_model, fk in COUNTERS:
+        last_pk = None
+        while True:
+            batch = model.objects.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            stored = dict(batch.values_list('pk', field)[:batch_size])
+            if not stored:
+                break
+            last_pk = max(stored)
+            counts = real_counts(counted_model, fk, list(stored))
+            drifted = [
+                model(pk=pk, **{field: counts[pk]})
+                for pk, value in stored.items() if value != counts[pk]
+            ]
+            repaired += len(drifted)
+            if drifted and not dry_run:
+                model.objects.bulk_update(drifted, [field])
+    return repaired
@@ -0,0 +1,90 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from posts.models import Comment, Follow, Group, Post
+
+# Строк на один запрос к БД при чтении курсором
+CHUNK_SIZE = 2000
+FORMATS = ('jsonl', 'csv')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+# Колонки CSV: объединение полей записей всех моделей
+CSV_FIELDS = (
+    'model', 'id', 'slug', 'title', 'description', 'user', 'author',
+    'group', 'post', 'text', 'pub_date', 'image',
+)
+
+
+def export_records(user):
+    """
+    Записи пользователя в формате yatube_import: группы его постов,
+    посты, комментарии и подписки в обе стороны. Строки читаются
+    .iterator() пачками по CHUNK_SIZE, в памяти одна пачка.
+    """
+    groups = Group.objects.filter(posts__author=user).distinct().order_by(
+        'pk'
+    ).values('slug', 'title', 'description')
+    for group in groups.iterator(chunk_size=CHUNK_SIZE):
+        yield {'model': 'group', **group}
+    posts = Post.objects.filter(author=user).order_by('pk').values_list(
+        'pk', 'group__slug', 'text', 'pub_date', 'image'
+    )
+    for pk, group, text, pub_date, image in posts.iterator(
+        chunk_size=CHUNK_SIZE
+    ):
+        yield {
+            'model': 'post', 'id': pk, 'author': user.username,
+            'group': group, 'text': text, 'pub_date': pub_date,
+            'image': image,
+        }
+    comments = Comment.objects.filter(author=user).order_by('pk').values_list(
+        'pk', 'post_id', 'text', 'pub_date'
+    )
+    for pk, post, text, pub_date in comments.iterator(chunk_size=CHUNK_SIZE):
+        yield {
+            'model': 'comment', 'id': pk, 'post': post,
+            'author': user.username, 'text': text, 'pub_date': pub_date,
+        }
+    following = Follow.objects.filter(user=user).order_by('pk').values_list(
+        'author__username', flat=True
+    )
+    for author in following.iterator(chunk_size=CHUNK_SIZE):
+        yield {'model': 'follow', 'user': user.username, 'author': author}
+    followers = Follow.objects.filter(author=user).order_by('pk').values_list(
+        'user__username', flat=True
+    )
+    for follower in followers.iterator(chunk_size=CHUNK_SIZE):
+        yield {'model': 'follow', 'user': follower, 'author': user.username}
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer: возвращает строку, не копя."""
+
+    def write(self, value):
+        return value
+
+
+def as_jsonl(records):
+    for record in records:
+        yield json.dumps(
+            record, cls=DjangoJSONEncoder, ensure_ascii=False
+        ) + '\n'
+
+
+def as_csv(records):
+    writer = csv.DictWriter(Echo(), fieldnames=CSV_FIELDS, restval='')
+    yield writer.writerow(dict(zip(CSV_FIELDS, CSV_FIELDS)))
+    for record in records:
+        if record.get('pub_date') is not None:
+            record['pub_date'] = record['pub_date'].isoformat()
+        yield writer.writerow(record)
+
+
+def export_lines(user, export_format='jsonl'):
+    """Строки выгрузки в выбранном формате, по одной."""
+    serialize = as_csv if export_format == 'csv' else as_jsonl
+    return serialize(export_records(user))
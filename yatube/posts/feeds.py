@@ -0,0 +1,124 @@
+import heapq
+import itertools
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+
+from posts.models import Post
+
+AUTHOR_FEED_KEY = 'author_feed:{}'
+
+
+def author_feed_key(author_id):
+    return AUTHOR_FEED_KEY.format(author_id)
+
+
+def load_author_feeds(author_ids, size=None):
+    """
+    Одним запросом читает из БД последние посты каждого автора
+    в виде {author_id: [(pub_date, id), ...]}.
+    """
+    size = size or settings.AUTHOR_FEED_SIZE
+    latest = Post.objects.filter(
+        author_id=OuterRef('author_id')
+    ).order_by('-pub_date', '-id').values('id')[:size]
+    rows = Post.objects.filter(
+        author_id__in=author_ids,
+        id__in=Subquery(latest)
+    ).order_by('-pub_date', '-id').values_list('author_id', 'pub_date', 'id')
+    feeds = defaultdict(list)
+    for author_id, pub_date, post_id in rows:
+        feeds[author_id].append((pub_date, post_id))
+    return {author_id: feeds[author_id] for author_id in author_ids}
+
+
+def get_author_feeds(author_ids, size=None):
+    """
+    Возвращает списки последних постов авторов из кэша.
+    Холодные списки подгружаются из БД и кладутся в кэш.
+    """
+    size = size or settings.AUTHOR_FEED_SIZE
+    keys = {author_feed_key(author_id): author_id for author_id in author_ids}
+    cached = cache.get_many(keys)
+    cold = [author_id for key, author_id in keys.items() if key not in cached]
+    warmed = {
+        author_feed_key(author_id): feed
+        for author_id, feed in load_author_feeds(cold, size).items()
+    }
+    if warmed:
+        cache.set_many(warmed, None)
+    cached.update(warmed)
+    return list(cached.values())
+
+
+def push_post(post):
+    """Добавляет новый пост в начало закэшированного списка автора."""
+    key = author_feed_key(post.author_id)
+    feed = cache.get(key)
+    if feed is None:
+        return
+    feed.insert(0, (post.pub_date, post.id))
+    feed.sort(reverse=True)
+    cache.set(key, feed[:settings.AUTHOR_FEED_SIZE], None)
+
+
+def forget_author(author_id):
+    cache.delete(author_feed_key(author_id))
+
+
+def merge_post_ids(feeds, stop, size=None):
+    """
+    K-way слияние списков авторов через кучу.
+    Возвращает первые stop id или None, если усечённых списков
+    не хватает, чтобы гарантировать правильный порядок.
+    """
+    size = size or settings.AUTHOR_FEED_SIZE
+    floor = max(
+        (feed[-1] for feed in feeds if len(feed) >= size),
+        default=None
+    )
+    merged = heapq.merge(*feeds, reverse=True)
+    if floor is not None:
+        merged = itertools.takewhile(lambda item: item >= floor, merged)
+    result = [post_id for _, post_id in itertools.islice(merged, stop)]
+    if len(result) < stop and floor is not None:
+        return None
+    return result
+
+
+class MergedFeed:
+    """
+    Лента подписок, собранная слиянием кэшированных списков авторов.
+    Поддерживает count() и срезы, поэтому подходит для Paginator.
+    """
+    ordered = True
+
+    def __init__(self, author_ids):
+        self.author_ids = list(author_ids)
+
+    def sql_queryset(self):
+        return Post.objects.filter(
+            author_id__in=self.author_ids
+        ).select_related('author', 'group').order_by('-pub_date', '-id')
+
+    def count(self):
+        return self.sql_queryset().count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, key.stop
+        if stop is None:
+            return list(self.sql_queryset()[start:])
+        ids = merge_post_ids(get_author_feeds(self.author_ids), stop)
+        if ids is None:
+            return list(self.sql_queryset()[start:stop])
+        posts = Post.objects.select_related(
+            'author', 'group'
+        ).in_bulk(ids[start:])
+        return [posts[post_id] for post_id in ids[start:] if post_id in posts]
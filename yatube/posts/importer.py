@@ -0,0 +1,303 @@
+import json
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import counters, feeds, page_cache, refcounts, search, timeline
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Обязательные поля записей; порядок сброса буферов:
+# сначала то, на что ссылаются остальные
+REQUIRED_FIELDS = {
+    'group': ('slug', 'title'),
+    'post': ('author', 'text'),
+    'comment': ('post', 'author', 'text'),
+    'follow': ('user', 'author'),
+}
+MODELS = tuple(REQUIRED_FIELDS)
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def read_records(lines):
+    """Записи JSONL по одной; пустые строки пропускаются."""
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise InvalidRecord(f'Строка {number}: {e}')
+        model = record.get('model')
+        if model not in REQUIRED_FIELDS:
+            raise InvalidRecord(
+                f'Строка {number}: неизвестная модель {model}'
+            )
+        missing = [
+            field for field in REQUIRED_FIELDS[model]
+            if record.get(field) in (None, '')
+        ]
+        if missing:
+            raise InvalidRecord(
+                f'Строка {number}: не заполнены поля {", ".join(missing)}'
+            )
+        yield record
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise InvalidRecord(f'Некорректная дата {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+@contextmanager
+def keep_pub_dates():
+    """
+    bulk_create подставляет now() в поля auto_now_add,
+    на время импорта даты берутся из записей.
+    """
+    fields = [model._meta.get_field('pub_date') for model in (Post, Comment)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def reset_sequences(*models):
+    """Сдвигает последовательности pk после вставки явных id."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+class Importer:
+    """
+    Потоковый импорт: записи копятся в буферах по моделям,
+    буферы пишутся bulk_create пачками по batch_size
+    в одной транзакции на пачку. bulk_create не вызывает сигналы,
+    поэтому ленты, счётчики, поиск и кэш страниц обновляются
+    в той же транзакции только для вставленных строк пачки.
+    Память не зависит от размера входа, кроме комментариев,
+    чьи посты ещё не встретились во входе.
+    """
+
+    def __init__(self, batch_size=1000, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.buffers = {model: [] for model in MODELS}
+        self.written = dict.fromkeys(MODELS, 0)
+        self.skipped = dict.fromkeys(MODELS, 0)
+        # Комментарии к постам, которых ещё нет в БД
+        self.waiting = []
+
+    def add(self, record):
+        buffer = self.buffers[record['model']]
+        buffer.append(record)
+        if len(buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        self.buffers['comment'][:0], self.waiting = self.waiting, []
+        with keep_pub_dates(), transaction.atomic():
+            for model in MODELS:
+                records, self.buffers[model] = self.buffers[model], []
+                if records:
+                    getattr(self, f'import_{model}s')(records)
+        if self.progress is not None:
+            self.progress(self)
+
+    def user_ids(self, usernames):
+        """id пользователей по username, недостающие создаются."""
+        usernames = set(filter(None, usernames))
+        found = dict(
+            User.objects.filter(username__in=usernames).values_list(
+                'username', 'pk'
+            )
+        )
+        missing = usernames - set(found)
+        if missing:
+            password = make_password(None)
+            User.objects.bulk_create(
+                (User(username=name, password=password) for name in missing),
+                ignore_conflicts=True
+            )
+            found.update(
+                User.objects.filter(username__in=missing).values_list(
+                    'username', 'pk'
+                )
+            )
+        return found
+
+    def group_ids(self, slugs):
+        return dict(
+            Group.objects.filter(slug__in=set(filter(None, slugs)))
+            .values_list('slug', 'pk')
+        )
+
+    def save(self, model_name, model, objects, total):
+        """
+        Пишет пачку и возвращает id действительно вставленных строк:
+        уже существующие строки пропускаются СУБД. Новые строки -
+        с id больше прежнего максимума или с явными id, которых не было.
+        """
+        explicit = {obj.pk for obj in objects if obj.pk is not None}
+        explicit -= set(
+            model.objects.filter(pk__in=explicit).values_list('pk', flat=True)
+        )
+        last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+        new_ids = list(
+            model.objects.filter(
+                Q(pk__gt=last_pk) | Q(pk__in=explicit)
+            ).values_list('pk', flat=True)
+        )
+        self.written[model_name] += len(new_ids)
+        self.skipped[model_name] += total - len(new_ids)
+        return new_ids
+
+    def refresh_users(self, user_ids):
+        """Счётчики и страницы профилей пользователей пачки."""
+        user_ids = set(user_ids)
+        counters.create_author_stats(
+            user_ids - set(
+                AuthorStats.objects.filter(user_id__in=user_ids)
+                .values_list('user_id', flat=True)
+            )
+        )
+        counters.recount(AuthorStats, user_ids)
+        page_cache.bump_on_commit(*(
+            f'profile:{username}' for username in User.objects.filter(
+                pk__in=user_ids
+            ).values_list('username', flat=True)
+        ))
+
+    def import_groups(self, records):
+        self.save('group', Group, [
+            Group(
+                slug=record['slug'],
+                title=record['title'],
+                description=record.get('description', '')
+            )
+            for record in records
+        ], len(records))
+
+    def import_posts(self, records):
+        users = self.user_ids(record['author'] for record in records)
+        groups = self.group_ids(record.get('group') for record in records)
+        new_ids = self.save('post', Post, [
+            Post(
+                id=record.get('id'),
+                author_id=users[record['author']],
+                group_id=groups.get(record.get('group')),
+                text=record['text'],
+                pub_date=parse_date(record.get('pub_date')),
+                image=record.get('image') or '',
+            )
+            for record in records
+        ], len(records))
+        if not new_ids:
+            return
+        timeline.fan_out_posts(new_ids)
+        search.index_posts(new_ids)
+        rows = Post.objects.filter(pk__in=new_ids).values_list(
+            'author_id', 'group_id', 'image'
+        )
+        author_ids, group_ids, images = (set(column) for column in zip(*rows))
+        group_ids.discard(None)
+        self.refresh_users(author_ids)
+        for author_id in author_ids:
+            feeds.forget_author(author_id)
+        counters.recount(Group, group_ids)
+        refcounts.recount(images)
+        page_cache.bump_on_commit('index', *(
+            f'group:{slug}' for slug in Group.objects.filter(
+                pk__in=group_ids
+            ).values_list('slug', flat=True)
+        ))
+
+    def import_comments(self, records):
+        users = self.user_ids(record['author'] for record in records)
+        posts = set(
+            Post.objects.filter(
+                pk__in={record['post'] for record in records}
+            ).values_list('pk', flat=True)
+        )
+        self.waiting.extend(
+            record for record in records if record['post'] not in posts
+        )
+        new_ids = self.save('comment', Comment, [
+            Comment(
+                id=record.get('id'),
+                post_id=record['post'],
+                author_id=users[record['author']],
+                text=record['text'],
+                pub_date=parse_date(record.get('pub_date')),
+            )
+            for record in records if record['post'] in posts
+        ], sum(record['post'] in posts for record in records))
+        if not new_ids:
+            return
+        search.index_comments(new_ids)
+        post_ids = set(
+            Comment.objects.filter(pk__in=new_ids).values_list(
+                'post_id', flat=True
+            )
+        )
+        counters.recount(Post, post_ids)
+        page_cache.bump_on_commit(
+            *(f'post:{post_id}' for post_id in post_ids)
+        )
+
+    def import_follows(self, records):
+        users = self.user_ids(
+            name for record in records
+            for name in (record['user'], record['author'])
+        )
+        new_ids = self.save('follow', Follow, [
+            Follow(
+                user_id=users[record['user']],
+                author_id=users[record['author']]
+            )
+            for record in records if record['user'] != record['author']
+        ], len(records))
+        if not new_ids:
+            return
+        follows = Follow.objects.filter(pk__in=new_ids).values_list(
+            'user_id', 'author_id'
+        )
+        for user_id, author_id in follows:
+            timeline.backfill(user_id, author_id)
+        self.refresh_users(
+            user_id for follow in follows for user_id in follow
+        )
+
+    def finish(self):
+        """
+        Дописывает остатки. Комментарии, чьи посты так и не
+        встретились, считаются пропущенными.
+        """
+        self.flush()
+        self.skipped['comment'] += len(self.waiting)
+        self.waiting = []
+        reset_sequences(Post, Comment)
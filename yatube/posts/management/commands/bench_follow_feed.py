@@ -0,0 +1,105 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.feeds import MergedFeed, author_feed_key
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает SQL-запрос ленты подписок, материализованную ленту '
+        'и k-way слияние. Данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--authors', type=int, nargs='+', default=[10, 100, 1000]
+        )
+        parser.add_argument('--posts-per-author', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        # Ключи лент тестовых авторов: после отката их id выдаются
+        # снова, и настоящие читатели увидели бы чужие посты
+        self.feed_keys = []
+        try:
+            with transaction.atomic():
+                for authors in options['authors']:
+                    self.bench(
+                        authors,
+                        options['posts_per_author'],
+                        options['repeat']
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            cache.delete_many(self.feed_keys)
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def bench(self, authors, posts_per_author, repeat):
+        reader = User.objects.create(username=f'bench_reader_{authors}')
+        User.objects.bulk_create(
+            User(username=f'bench_author_{authors}_{num}')
+            for num in range(authors)
+        )
+        users = User.objects.filter(
+            username__startswith=f'bench_author_{authors}_'
+        )
+        Post.objects.bulk_create(
+            Post(text='bench', author=author)
+            for author in users for _ in range(posts_per_author)
+        )
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=author) for author in users
+        )
+        for author in users:
+            timeline.backfill(reader.id, author.id)
+        author_ids = list(users.values_list('id', flat=True))
+        feed_keys = [author_feed_key(author_id) for author_id in author_ids]
+        self.feed_keys.extend(feed_keys)
+        page = slice(0, settings.PER_PAGE)
+
+        def sql():
+            list(Post.objects.filter(author__following__user=reader)[page])
+
+        def materialized():
+            list(Post.objects.filter(timeline_entries__user=reader)[page])
+
+        def merge_cold():
+            cache.delete_many(feed_keys)
+            MergedFeed(author_ids)[page]
+
+        def merge_warm():
+            MergedFeed(author_ids)[page]
+
+        merge_warm()
+        results = {
+            'sql join': self.measure(sql, repeat),
+            'timeline': self.measure(materialized, repeat),
+            'merge (warm)': self.measure(merge_warm, repeat),
+            'merge (cold)': self.measure(merge_cold, max(repeat // 4, 1)),
+        }
+        self.stdout.write(f'Авторов в подписках: {authors}')
+        for name, median in results.items():
+            self.stdout.write(f'  {name:<14} {median:8.2f} мс')
@@ -0,0 +1,106 @@
+import io
+import os
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+from sorl.thumbnail.engines.pil_engine import Engine as PILEngine
+from sorl.thumbnail.parsers import parse_geometry
+
+from posts.thumbnail_engine import Engine
+from posts.thumbnails import CARD_OPTIONS, ThumbnailBackend
+
+ENGINES = (
+    ('sorl pil', PILEngine),
+    ('draft + reduce', Engine),
+)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стандартный Pillow-движок sorl с движком '
+        'на draft() и reduce(): время миниатюры карточки '
+        'и объём декодированных пикселей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='Файлы или каталоги с фотографиями'
+        )
+        parser.add_argument(
+            '--generate', type=int, default=5,
+            help='Сколько синтетических фото создать, если путей нет'
+        )
+        parser.add_argument('--size', default='4000x3000')
+        parser.add_argument('--geometry', default='960x339')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        corpus = self.load_corpus(options)
+        if not corpus:
+            raise CommandError('Нет картинок для замера')
+        self.stdout.write(f'Картинок: {len(corpus)}')
+        for name, engine_class in ENGINES:
+            timings, decoded = self.bench(
+                engine_class(), corpus, options['geometry'],
+                options['repeat']
+            )
+            self.stdout.write(
+                f'  {name:<16} {statistics.median(timings):8.1f} мс, '
+                f'декодировано {max(decoded) / 2 ** 20:7.1f} МБ'
+            )
+
+    def load_corpus(self, options):
+        files = []
+        for path in options['paths']:
+            if os.path.isdir(path):
+                files.extend(
+                    os.path.join(path, name)
+                    for name in sorted(os.listdir(path))
+                    if name.lower().endswith(IMAGE_EXTENSIONS)
+                )
+            else:
+                files.append(path)
+        if files:
+            corpus = []
+            for path in files:
+                with open(path, 'rb') as file_:
+                    corpus.append(file_.read())
+            return corpus
+        width, height = map(int, options['size'].split('x'))
+        return [
+            self.synthetic_photo(width, height)
+            for _ in range(options['generate'])
+        ]
+
+    def synthetic_photo(self, width, height):
+        image = Image.merge('RGB', [
+            Image.effect_noise((width, height), sigma)
+            for sigma in (24, 40, 64)
+        ])
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=90)
+        return buffer.getvalue()
+
+    def bench(self, engine, corpus, geometry_string, repeat):
+        options = {
+            **ThumbnailBackend.default_options,
+            **CARD_OPTIONS,
+            'format': 'JPEG',
+        }
+        timings, decoded = [], []
+        for raw in corpus:
+            for _ in range(repeat):
+                source = Image.open(io.BytesIO(raw))
+                geometry = parse_geometry(
+                    geometry_string, engine.get_image_ratio(source, options)
+                )
+                started = time.perf_counter()
+                engine.create(source, geometry, options)
+                timings.append((time.perf_counter() - started) * 1000)
+                width, height = source.size
+                decoded.append(width * height * len(source.getbands()))
+        return timings, decoded
@@ -0,0 +1,109 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts import workers
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересоздаёт миниатюры карточек всех постов с картинками '
+        'в пуле процессов, с контрольной точкой для продолжения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов, по умолчанию по числу ядер'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с id последнего обработанного поста'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать и уже готовые миниатюры'
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        last_id = self.read_checkpoint(checkpoint)
+        if last_id:
+            self.stdout.write(f'Продолжаем после поста {last_id}')
+        done = failed = 0
+        started = time.perf_counter()
+        with self.get_executor(options['workers']) as executor:
+            for batch in self.batches(last_id, options['batch_size']):
+                failed += self.run_batch(executor, batch, options)
+                done += len(batch)
+                # Точка не обгоняет пачку с ошибками:
+                # продолжение повторит её вместе с последующими
+                if not failed:
+                    self.write_checkpoint(checkpoint, batch[-1][0])
+                self.report(done, failed, started)
+        if checkpoint and not failed and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+    def batches(self, last_id, batch_size):
+        """
+        Посты с картинками пачками по keyset (pk > последнего).
+        Пачка читается целиком до отправки воркерам: открытый курсор
+        .iterator() в SQLite держит блокировку и не даёт воркерам
+        записывать kvstore.
+        """
+        posts = Post.objects.exclude(image='').order_by('pk')
+        while True:
+            batch = list(
+                posts.filter(pk__gt=last_id).values_list(
+                    'pk', 'image'
+                )[:batch_size]
+            )
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1][0]
+
+    def get_executor(self, max_workers):
+        # spawn, а не fork: процессы не наследуют соединения с БД,
+        # через которые родитель читает посты
+        return ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=workers.init_worker
+        )
+
+    def run_batch(self, executor, batch, options):
+        """Обрабатывает пачку и возвращает число ошибок."""
+        names = list(dict.fromkeys(name for _, name in batch))
+        results = executor.map(
+            workers.regenerate_thumbnails,
+            names,
+            [options['force']] * len(names)
+        )
+        return list(results).count(False)
+
+    def report(self, done, failed, started):
+        elapsed = time.perf_counter() - started
+        rate = done / elapsed if elapsed else 0
+        self.stdout.write(
+            f'Постов: {done}, ошибок: {failed}, {rate:.1f} постов/с'
+        )
+
+    def read_checkpoint(self, path):
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path) as file_:
+            return int(file_.read().strip() or 0)
+
+    def write_checkpoint(self, path, post_id):
+        if not path:
+            return
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as file_:
+            file_.write(str(post_id))
+        os.replace(temporary, path)
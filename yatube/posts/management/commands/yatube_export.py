@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exporter
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковая выгрузка постов, комментариев и подписок пользователя '
+        'в JSONL (формат yatube_import) или CSV.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--format', choices=exporter.FORMATS, default='jsonl'
+        )
+        parser.add_argument(
+            '--output', help='Файл выгрузки, по умолчанию стандартный вывод'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден'
+            )
+        lines = exporter.export_lines(user, options['format'])
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+            f.writelines(lines)
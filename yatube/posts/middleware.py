@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import parse_http_date_safe
+
+from posts.page_cache import canonicalize, get_versions
+
+CACHE_KEY = 'anon_page:{}'
+
+
+class AnonymousPageCacheMiddleware:
+    """
+    Кэш целых страниц для гостей. Стоит в MIDDLEWARE до сессий:
+    попадание отдаётся без сессии, пользователя и ORM.
+    Запросы с cookie сессии обходят кэш.
+
+    Ключ - путь и строка запроса, приведённая page_cache.canonicalize
+    к параметрам, которые читает представление. Вместе со страницей
+    хранятся версии областей page_cache, объявленных представлением
+    в request.page_scopes, прочитанные до рендера
+    (request.page_versions); страница без областей живёт
+    ANON_PAGE_CACHE_TIMEOUT.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        match = self.public_match(request)
+        if match is None or not self.is_cacheable_request(request):
+            response = self.get_response(request)
+            if match is not None and not response.has_header(
+                'Cache-Control'
+            ):
+                patch_cache_control(response, private=True)
+            return response
+        query = canonicalize(request, match.func)
+        key = CACHE_KEY.format(f'{request.path}?{query}')
+        cached = cache.get(key)
+        if cached is not None:
+            scopes, versions, response = cached
+            if get_versions(scopes) == versions:
+                return get_conditional_response(
+                    request,
+                    etag=response.get('ETag'),
+                    last_modified=parse_http_date_safe(
+                        response.get('Last-Modified', '')
+                    ),
+                    response=response
+                )
+        response = self.get_response(request)
+        if self.is_cacheable_response(response):
+            scopes = getattr(request, 'page_scopes', ())
+            versions = getattr(request, 'page_versions', '')
+            timeout = (
+                settings.PAGE_CACHE_TIMEOUT if scopes
+                else settings.ANON_PAGE_CACHE_TIMEOUT
+            )
+            patch_cache_control(
+                response, public=True, max_age=settings.ANON_PAGE_MAX_AGE
+            )
+            patch_vary_headers(response, ('Cookie',))
+            cache.set(key, (scopes, versions, response), timeout)
+        return response
+
+    def public_match(self, request):
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        if match.namespace not in settings.ANON_PAGE_CACHE_NAMESPACES:
+            return None
+        return match
+
+    def is_cacheable_request(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        skip_cookies = (
+            settings.SESSION_COOKIE_NAME,
+            *settings.ANON_PAGE_CACHE_SKIP_COOKIES
+        )
+        return not any(name in request.COOKIES for name in skip_cookies)
+
+    def is_cacheable_response(self, response):
+        # Страницы, выставившие cookie (например, csrftoken для формы),
+        # привязаны к конкретному клиенту
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and 'private' not in response.get('Cache-Control', '')
+        )
@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from django.db import models
 
 from core.models import CreatedModel
+from posts.storage import ContentAddressedStorage
 
 
 class Group(models.Model):
@@ -19,12 +20,22 @@ class Group(models.Model):
         'Описание группы',
         help_text='Описание группы'
     )
+    posts_count = models.PositiveIntegerField(
+        'Число постов',
+        default=0,
+        editable=False,
+        help_text='Счётчик постов группы'
+    )
 
     def __str__(self) -> str:
         return self.title
 
     def __len__(self):
-        return Post.objects.filter(group__slug=self.slug).count()
+        return self.posts_count
+
+    def __bool__(self):
+        # Иначе {% if post.group %} зависит от __len__
+        return True
 
 
 User = get_user_model()
@@ -54,12 +65,27 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         help_text='Изображение'
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False,
+        help_text='Счётчик комментариев поста'
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('author', 'pub_date'),
+                name='post_author_pub_date_idx'),
+            models.Index(
+                fields=('group', 'pub_date'),
+                name='post_group_pub_date_idx'),
+        )
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -125,3 +151,107 @@ class Follow(models.Model):
 
     def __str__(self) -> str:
         return f'{self.user} подписан на {self.author}'
+
+
+class AuthorStats(models.Model):
+    """
+    Денормализованные счётчики пользователя,
+    чтобы не считать COUNT(*) на каждой странице
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+        help_text='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        'Число постов',
+        default=0,
+        help_text='Счётчик постов автора'
+    )
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0,
+        help_text='Счётчик подписчиков автора'
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок',
+        default=0,
+        help_text='Счётчик подписок пользователя'
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self) -> str:
+        return f'Счётчики {self.user}'
+
+
+class TimelineEntry(models.Model):
+    """
+    Материализованная лента подписок:
+    пост автора, разосланный каждому подписчику при публикации
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Читатель',
+        help_text='Владелец ленты'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+        help_text='Пост в ленте'
+    )
+    pub_date = models.DateTimeField(
+        'Дата публикации',
+        help_text='Дата публикации поста'
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_entry'),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', 'pub_date'),
+                name='timeline_user_pub_date_idx'),
+        )
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+    def __str__(self) -> str:
+        return f'{self.post} в ленте {self.user}'
+
+
+class StoredFile(models.Model):
+    """
+    Число постов, ссылающихся на файл в ContentAddressedStorage.
+    Файл удаляется, когда ссылок не осталось
+    """
+    name = models.CharField(
+        'Имя файла',
+        max_length=255,
+        primary_key=True,
+        help_text='Путь файла в хранилище'
+    )
+    refs = models.PositiveIntegerField(
+        'Число ссылок',
+        default=0,
+        help_text='Сколько постов используют файл'
+    )
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self) -> str:
+        return self.name
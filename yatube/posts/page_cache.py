@@ -0,0 +1,225 @@
+import hashlib
+import secrets
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Max
+from django.http import QueryDict
+from django.utils.encoding import iri_to_uri
+from django.views.decorators.http import condition
+
+from core import single_flight
+from posts import page_shell
+from posts.models import Post
+
+VERSION_KEY = 'page_version:{}'
+PAGE_KEY = 'page:{}:{}'
+# Значения параметров, равносильные их отсутствию
+QUERY_DEFAULTS = {'page': '1'}
+
+
+def new_version():
+    """
+    Уникальная версия: время и случайный хвост. Версии
+    не увеличиваются через incr - в файловом кэше он не атомарен.
+    """
+    return f'{time.time_ns()}-{secrets.token_hex(4)}'
+
+
+def version_key(scope):
+    """Ключ версии области: имя хэшируется, в слагах бывает кириллица."""
+    return VERSION_KEY.format(hashlib.md5(scope.encode()).hexdigest())
+
+
+def get_versions(scopes):
+    """
+    Текущие версии областей кэша одной строкой.
+    Потерянная версия заводится заново, а не с единицы,
+    чтобы не поднять старые страницы.
+    """
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, new_version(), None)
+            versions[key] = cache.get(key)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def bump(*scopes):
+    """Сбрасывает все страницы областей, меняя их версии."""
+    cache.set_many(
+        {version_key(scope): new_version() for scope in scopes}, None
+    )
+
+
+def bump_on_commit(*scopes):
+    """
+    Сбрасывает области сейчас и ещё раз после коммита транзакции:
+    страница, которую параллельный запрос отрисовал по данным
+    до коммита и сохранил под новой версией, не переживёт второй сброс.
+    """
+    bump(*scopes)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: bump(*scopes))
+
+
+def view_query_params(view):
+    """
+    Параметры запроса, которые читает представление: атрибут
+    cache_query_params его класса. Без атрибута - никакие.
+    """
+    view_class = getattr(view, 'view_class', None)
+    return getattr(view_class, 'cache_query_params', ())
+
+
+def canonicalize(request, view):
+    """
+    Оставляет в запросе только параметры, которые читает view,
+    в порядке их объявления, без пустых значений и значений
+    по умолчанию; номер страницы - без ведущих нулей. Страница
+    рендерится по этому запросу, поэтому мусорные параметры
+    не попадают ни в ключ кэша, ни в ссылки пагинатора.
+    """
+    pairs = []
+    for name in view_query_params(view):
+        value = request.GET.get(name, '').strip()
+        if name == 'page' and value.isdigit():
+            value = str(int(value))
+        if value and value != QUERY_DEFAULTS.get(name):
+            pairs.append((name, value))
+    query = urlencode(pairs)
+    request.GET = QueryDict(query)
+    request.META['QUERY_STRING'] = query
+    return query
+
+
+def page_key(request, key_prefix):
+    url = iri_to_uri(request.build_absolute_uri())
+    return PAGE_KEY.format(key_prefix, hashlib.md5(url.encode()).hexdigest())
+
+
+def is_cacheable(response):
+    return (
+        response.status_code == 200
+        and callable(getattr(response, 'render', None))
+        and not response.cookies
+    )
+
+
+def versioned_cache_page(timeout, key_prefix, scopes):
+    """
+    Кэширует страницу с меткой из версий областей scopes.
+    Области - шаблоны строк, заполняемые kwargs представления,
+    например 'group:{slug}'. В кэш кладётся общая для всех
+    пользователей оболочка: части, зависящие от зрителя,
+    остаются в ней метками page_shell и заполняются на каждый запрос.
+    Устаревшую страницу пересчитывает один запрос (single_flight),
+    остальные пока получают прежнюю. Ключ строится по запросу,
+    приведённому canonicalize; страницы вне диапазона отвечают 404
+    и в кэш не попадают.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            versions = get_versions(
+                scope.format(**kwargs) for scope in scopes
+            )
+            canonicalize(request, view)
+
+            def render():
+                response = view(request, *args, **kwargs)
+                if is_cacheable(response):
+                    response.context_data[page_shell.SHELL_FLAG] = True
+                    response.render()
+                return response
+
+            response = single_flight.get_or_recompute(
+                page_key(request, key_prefix),
+                render,
+                timeout,
+                stamp=versions,
+                cacheable=is_cacheable
+            )
+            if response.streaming:
+                return response
+            return page_shell.fill_response(response, request)
+        return wrapper
+    return decorator
+
+
+def page_etag(request, scopes):
+    """
+    Слабый ETag страницы: версии областей и пользователь,
+    для которого она отрисована. Считается без запросов к БД.
+    Версии запоминаются в request.page_versions до рендера:
+    кэш страниц гостей хранит страницу с ними, а не с версиями
+    после рендера, которые уже могли смениться.
+    """
+    request.page_versions = get_versions(scopes)
+    return f'W/"{request.page_versions}.{request.user.pk or "anon"}"'
+
+
+def conditional_page(scopes):
+    """
+    Отвечает 304 на If-None-Match с текущими версиями областей
+    scopes, не вызывая представление и кэш страниц. Области
+    запоминаются в request.page_scopes для кэша страниц гостей.
+    """
+    def etag(request, *args, **kwargs):
+        request.page_scopes = [scope.format(**kwargs) for scope in scopes]
+        return page_etag(request, request.page_scopes)
+    return condition(etag_func=etag)
+
+
+def post_validators(request, post_id):
+    """
+    Области и время последнего изменения поста с комментариями
+    одним запросом по первичному ключу; результат запоминается
+    в запросе для обеих функций condition.
+    """
+    if not hasattr(request, '_post_validators'):
+        row = Post.objects.filter(pk=post_id).order_by().annotate(
+            last_comment=Max('comments__pub_date')
+        ).values_list(
+            'author__username', 'group__slug', 'pub_date', 'last_comment'
+        ).first()
+        request._post_validators = row
+    return request._post_validators
+
+
+def post_etag(request, post_id):
+    row = post_validators(request, post_id)
+    if row is None:
+        return None
+    username, slug, _, _ = row
+    scopes = [f'post:{post_id}', f'profile:{username}']
+    if slug:
+        scopes.append(f'group:{slug}')
+    request.page_scopes = scopes
+    return page_etag(request, scopes)
+
+
+def post_last_modified(request, post_id):
+    """
+    Публикация поста или последнего комментария. Правки поста
+    дату не меняют, их отражает ETag, который по RFC 7232
+    проверяется раньше If-Modified-Since.
+    """
+    row = post_validators(request, post_id)
+    if row is None:
+        return None
+    _, _, pub_date, last_comment = row
+    return max(filter(None, (pub_date, last_comment)))
+
+
+def post_scopes(post):
+    scopes = ['index', f'post:{post.pk}', f'profile:{post.author.username}']
+    if post.group_id:
+        scopes.append(f'group:{post.group.slug}')
+    return scopes
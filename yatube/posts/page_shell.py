@@ -0,0 +1,46 @@
+import json
+import re
+
+from django.template.loader import render_to_string
+
+# Флаг контекста: страница рендерится как общая для всех оболочка
+SHELL_FLAG = 'page_shell'
+SLOT = '<!--viewer-slot {}-->'
+SLOT_PATTERN = re.compile(r'<!--viewer-slot (\{.*?\})-->')
+
+
+def render_slot(request, template_name, user=None, **params):
+    """HTML зависящей от зрителя части страницы."""
+    if user is None and request is not None:
+        user = request.user
+    return render_to_string(
+        template_name, {'user': user, **params}, request=request
+    )
+
+
+def slot(context, template_name, **params):
+    """
+    В оболочке - метка с именем шаблона и параметрами,
+    иначе сразу HTML для текущего зрителя.
+    Параметры должны сериализоваться в JSON.
+    """
+    if context.get(SHELL_FLAG):
+        return SLOT.format(
+            json.dumps({'template': template_name, **params}, sort_keys=True)
+        )
+    return render_slot(
+        context.get('request'), template_name, context.get('user'), **params
+    )
+
+
+def fill(content, request):
+    """Заменяет метки оболочки частями для пользователя запроса."""
+    def render(match):
+        params = json.loads(match.group(1))
+        return render_slot(request, params.pop('template'), **params)
+    return SLOT_PATTERN.sub(render, content)
+
+
+def fill_response(response, request):
+    response.content = fill(response.content.decode(response.charset), request)
+    return response
@@ -0,0 +1,251 @@
+import base64
+import collections.abc
+from math import ceil
+
+from django.core.paginator import EmptyPage, InvalidPage, Paginator
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPage(collections.abc.Sequence):
+    """
+    Страница курсорной пагинации:
+    знает только соседние курсоры, без общего числа записей
+    """
+    cursor_paginated = True
+
+    def __init__(self, object_list, paginator,
+                 next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset-пагинация по (pub_date, id) в порядке Post.Meta.ordering.
+    Стоимость страницы не зависит от её глубины:
+    нет ни OFFSET, ни COUNT(*). Можно листать таблицу-индекс
+    с той же датой, например записи ленты: key_field - её поле
+    с id объекта, load превращает прочитанные строки в объекты.
+    """
+    query_param = 'cursor'
+    NEXT = 'n'
+    PREVIOUS = 'p'
+
+    def __init__(self, object_list, per_page, key_field='pk', load=list):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.key_field = key_field
+        self.load = load
+
+    def encode_cursor(self, direction, obj):
+        raw = f'{direction}|{obj.pub_date.isoformat()}|{obj.pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+            direction, pub_date, pk = raw.split('|')
+            pub_date = parse_datetime(pub_date)
+            pk = int(pk)
+        except (ValueError, UnicodeError):
+            raise InvalidCursor('Некорректный курсор')
+        if direction not in (self.NEXT, self.PREVIOUS) or pub_date is None:
+            raise InvalidCursor('Некорректный курсор')
+        return direction, pub_date, pk
+
+    def page(self, cursor=None):
+        if not cursor:
+            return self._page_after(None)
+        direction, pub_date, pk = self.decode_cursor(cursor)
+        if direction == self.NEXT:
+            return self._page_after((pub_date, pk))
+        return self._page_before((pub_date, pk))
+
+    def _page_after(self, position):
+        queryset = self.object_list
+        if position is not None:
+            pub_date, pk = position
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date)
+                | Q(pub_date=pub_date, **{f'{self.key_field}__lt': pk})
+            )
+        rows = self.load(
+            queryset.order_by(
+                '-pub_date', f'-{self.key_field}'
+            )[:self.per_page + 1]
+        )
+        items = rows[:self.per_page]
+        next_cursor = previous_cursor = None
+        if len(rows) > self.per_page:
+            next_cursor = self.encode_cursor(self.NEXT, items[-1])
+        if position is not None and items:
+            previous_cursor = self.encode_cursor(self.PREVIOUS, items[0])
+        return CursorPage(items, self, next_cursor, previous_cursor)
+
+    def _page_before(self, position):
+        pub_date, pk = position
+        rows = self.load(
+            self.object_list.filter(
+                Q(pub_date__gt=pub_date)
+                | Q(pub_date=pub_date, **{f'{self.key_field}__gt': pk})
+            ).order_by('pub_date', self.key_field)[:self.per_page + 1]
+        )
+        items = rows[:self.per_page][::-1]
+        next_cursor = previous_cursor = None
+        if len(rows) > self.per_page:
+            previous_cursor = self.encode_cursor(self.PREVIOUS, items[0])
+        if items:
+            next_cursor = self.encode_cursor(self.NEXT, items[-1])
+        return CursorPage(items, self, next_cursor, previous_cursor)
+
+
+class CountFreePaginator(Paginator):
+    """
+    Paginator без SELECT COUNT(*): читает per_page + 1 строк,
+    чтобы узнать, есть ли следующая страница.
+    count - доверенный счётчик (например, из AuthorStats),
+    estimate - приблизительное число записей только для показа.
+    """
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, count=None, estimate=None,
+                 on_each_side=2, on_ends=1):
+        super().__init__(object_list, per_page, orphans,
+                         allow_empty_first_page)
+        self.known_count = count
+        self.estimate = estimate
+        self.on_each_side = on_each_side
+        self.on_ends = on_ends
+        self.number = None
+        self.rows_on_page = 0
+        self.more = False
+
+    def validate_number(self, number):
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise InvalidPage('Номер страницы должен быть целым числом')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('На этой странице нет результатов')
+        self.number = number
+        self.rows_on_page = min(len(rows), self.per_page)
+        self.more = len(rows) > self.per_page
+        return self._get_page(rows[:self.per_page], number, self)
+
+    @property
+    def count_known(self):
+        return self.known_count is not None
+
+    @property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        if self.number is None:
+            return 0
+        seen = (self.number - 1) * self.per_page + self.rows_on_page
+        return seen + int(self.more)
+
+    @property
+    def num_pages(self):
+        if self.number is None:
+            return 1
+        if not self.more:
+            return self.number
+        pages = self.number + 1
+        if self.known_count is not None:
+            pages = max(pages, ceil(self.known_count / self.per_page))
+        return pages
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+    @property
+    def page_window(self):
+        """
+        Номера страниц вокруг текущей и по краям,
+        пропуски обозначены ELLIPSIS.
+        """
+        if self.number is None:
+            return []
+        last = self.num_pages
+        numbers = sorted(
+            number for number in {
+                *range(1, self.on_ends + 1),
+                *range(self.number - self.on_each_side,
+                       self.number + self.on_each_side + 1),
+                *range(last - self.on_ends + 1, last + 1),
+            }
+            if 1 <= number <= last
+        )
+        window = []
+        for number in numbers:
+            if window and number - window[-1] > 1:
+                window.append(self.ELLIPSIS)
+            window.append(number)
+        return window
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator для админки: для таблицы без фильтров
+    вместо COUNT(*) берёт оценку по MAX(pk).
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.where:
+            return super().count
+        return queryset.aggregate(estimate=Max('pk'))['estimate'] or 0
+
+    def page(self, number):
+        """
+        После удалений оценка завышена и последние страницы пусты:
+        вместо них отдаётся последняя страница с записями
+        по точному COUNT(*).
+        """
+        page = super().page(number)
+        if page.number == 1 or page.object_list:
+            return page
+        self.__dict__['count'] = self.object_list.count()
+        self.__dict__.pop('num_pages', None)
+        return super().page(min(page.number, self.num_pages))
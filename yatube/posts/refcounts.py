@@ -0,0 +1,93 @@
+import logging
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.db.models import Count, F
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import Post, StoredFile
+
+logger = logging.getLogger(__name__)
+
+
+def storage():
+    return Post._meta.get_field('image').storage
+
+
+def acquire(name):
+    """Добавляет ссылку на файл."""
+    if not name:
+        return
+    updated = StoredFile.objects.filter(name=name).update(refs=F('refs') + 1)
+    if not updated:
+        _, created = StoredFile.objects.get_or_create(
+            name=name, defaults={'refs': 1}
+        )
+        if not created:
+            StoredFile.objects.filter(name=name).update(refs=F('refs') + 1)
+
+
+def lock(name):
+    """
+    Блокирует строку файла до конца транзакции. Хранилище берёт
+    блокировку перед exists(): файл, найденный при загрузке,
+    не удалится до acquire() в той же транзакции.
+    """
+    StoredFile.objects.filter(name=name).update(refs=F('refs'))
+
+
+def release(name):
+    """
+    Убирает ссылку на файл. Файл без ссылок удаляется
+    из хранилища после коммита транзакции.
+    """
+    if not name:
+        return
+    StoredFile.objects.filter(name=name, refs__gt=0).update(
+        refs=F('refs') - 1
+    )
+    if StoredFile.objects.filter(name=name, refs=0).exists():
+        transaction.on_commit(lambda: delete_unused(name))
+
+
+@transaction.atomic
+def delete_unused(name):
+    """
+    Удаляет строку без ссылок, файл и его миниатюры в одной
+    транзакции: загрузка того же файла ждёт её в lock()
+    и затем записывает файл заново.
+    """
+    deleted, _ = StoredFile.objects.filter(name=name, refs=0).delete()
+    if not deleted:
+        return
+    try:
+        default.backend.delete(ImageFile(name, storage()))
+    except SuspiciousFileOperation:
+        logger.warning('Файл %s вне хранилища, не удаляется', name)
+
+
+def recount(names):
+    """Пересчитывает ссылки на файлы names по постам."""
+    names = list(filter(None, names))
+    if not names:
+        return
+    rows = Post.objects.filter(image__in=names).order_by().values(
+        'image'
+    ).annotate(refs=Count('pk')).values_list('image', 'refs')
+    StoredFile.objects.filter(name__in=names).delete()
+    StoredFile.objects.bulk_create(
+        StoredFile(name=name, refs=refs) for name, refs in rows
+    )
+
+
+def rebuild():
+    """Пересчитывает ссылки по всем постам с картинками."""
+    rows = Post.objects.exclude(image='').order_by().values(
+        'image'
+    ).annotate(refs=Count('pk')).values_list('image', 'refs')
+    with transaction.atomic():
+        StoredFile.objects.all().delete()
+        StoredFile.objects.bulk_create(
+            StoredFile(name=name, refs=refs) for name, refs in rows
+        )
@@ -0,0 +1,202 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from posts.models import Post
+
+POST_TABLE = 'posts_post_fts'
+COMMENT_TABLE = 'posts_comment_fts'
+
+CREATE_TABLES = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {POST_TABLE} '
+    f'USING fts5(text, tokenize="unicode61")',
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {COMMENT_TABLE} '
+    f'USING fts5(text, post_id UNINDEXED, tokenize="unicode61")',
+)
+DROP_TABLES = (
+    f'DROP TABLE IF EXISTS {POST_TABLE}',
+    f'DROP TABLE IF EXISTS {COMMENT_TABLE}',
+)
+
+# Посты, найденные по своему тексту или по комментариям,
+# с лучшим (наименьшим) значением bm25
+RANKED_POSTS_SQL = f'''
+    SELECT post_id, MIN(rank) AS best_rank FROM (
+        SELECT rowid AS post_id, bm25({POST_TABLE}) AS rank
+        FROM {POST_TABLE} WHERE {POST_TABLE} MATCH %s
+        UNION ALL
+        SELECT post_id, bm25({COMMENT_TABLE}) AS rank
+        FROM {COMMENT_TABLE} WHERE {COMMENT_TABLE} MATCH %s
+    )
+    GROUP BY post_id
+    ORDER BY best_rank, post_id DESC
+'''
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def to_match_query(query, prefix=False):
+    """
+    Превращает пользовательский запрос в безопасный запрос FTS5:
+    каждое слово в кавычках, все слова обязательны.
+    С prefix слова ищутся и как начала слов.
+    """
+    suffix = '*' if prefix else ''
+    return ' '.join(
+        f'"{word}"{suffix}' for word in re.findall(r'\w+', query)
+    )
+
+
+def create_tables(cursor):
+    for sql in CREATE_TABLES:
+        cursor.execute(sql)
+
+
+def drop_tables(cursor):
+    for sql in DROP_TABLES:
+        cursor.execute(sql)
+
+
+def index_post(post):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {POST_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {POST_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text]
+        )
+
+
+def unindex_post(post_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {POST_TABLE} WHERE rowid = %s', [post_id])
+
+
+def index_comment(comment):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {COMMENT_TABLE} WHERE rowid = %s', [comment.pk]
+        )
+        cursor.execute(
+            f'INSERT INTO {COMMENT_TABLE} (rowid, text, post_id) '
+            f'VALUES (%s, %s, %s)',
+            [comment.pk, comment.text, comment.post_id]
+        )
+
+
+def unindex_comment(comment_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {COMMENT_TABLE} WHERE rowid = %s', [comment_id]
+        )
+
+
+def index_posts(post_ids):
+    """Переиндексирует пачку постов по id."""
+    if not is_available() or not post_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {POST_TABLE} WHERE rowid IN ({placeholders})',
+            post_ids
+        )
+        cursor.execute(
+            f'INSERT INTO {POST_TABLE} (rowid, text) '
+            f'SELECT id, text FROM posts_post WHERE id IN ({placeholders})',
+            post_ids
+        )
+
+
+def index_comments(comment_ids):
+    """Переиндексирует пачку комментариев по id."""
+    if not is_available() or not comment_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(comment_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {COMMENT_TABLE} WHERE rowid IN ({placeholders})',
+            comment_ids
+        )
+        cursor.execute(
+            f'INSERT INTO {COMMENT_TABLE} (rowid, text, post_id) '
+            f'SELECT id, text, post_id FROM posts_comment '
+            f'WHERE id IN ({placeholders})',
+            comment_ids
+        )
+
+
+def rebuild():
+    """Переиндексирует все посты и комментарии."""
+    with connection.cursor() as cursor:
+        drop_tables(cursor)
+        create_tables(cursor)
+        cursor.execute(
+            f'INSERT INTO {POST_TABLE} (rowid, text) '
+            f'SELECT id, text FROM posts_post'
+        )
+        cursor.execute(
+            f'INSERT INTO {COMMENT_TABLE} (rowid, text, post_id) '
+            f'SELECT id, text, post_id FROM posts_comment'
+        )
+
+
+class MatchingIds(RawSQL):
+    """
+    Подзапрос для lookup __in. Скобки добавляет сам lookup:
+    в двойных скобках SQLite выполняет подзапрос как скалярный
+    и берёт только первую найденную строку.
+    """
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def matching_ids(table, query, prefix=False):
+    """
+    Подзапрос id записей, подходящих под запрос, для filter(pk__in=...).
+    Запрос без слов ничего не находит.
+    """
+    match = to_match_query(query, prefix)
+    if not match:
+        return []
+    return MatchingIds(
+        f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [match]
+    )
+
+
+class SearchResults:
+    """
+    Посты, найденные полнотекстовым поиском, в порядке bm25.
+    Поддерживает срезы, поэтому подходит для Paginator.
+    """
+
+    def __init__(self, query):
+        self.match = to_match_query(query)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        if not self.match:
+            return []
+        start = key.start or 0
+        sql = RANKED_POSTS_SQL
+        params = [self.match, self.match]
+        if key.stop is not None:
+            sql += ' LIMIT %s OFFSET %s'
+            params += [key.stop - start, start]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
@@ -0,0 +1,229 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from posts import counters, feeds, page_cache, refcounts, search, timeline
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Поля пользователя, которые выводятся на страницах
+NAMES = ('username', 'first_name', 'last_name')
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_names(sender, instance, raw=False, update_fields=None,
+                            **kwargs):
+    instance._previous_names = None
+    if update_fields is not None and not set(update_fields) & set(NAMES):
+        return
+    if not raw and not instance._state.adding:
+        instance._previous_names = User.objects.filter(
+            pk=instance.pk
+        ).values_list(*NAMES).first()
+
+
+@receiver(pre_save, sender=Group)
+def remember_previous_group(sender, instance, raw=False, **kwargs):
+    instance._previous_group = None
+    if not raw and not instance._state.adding:
+        instance._previous_group = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', 'title').first()
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous(sender, instance, raw=False, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_image = ''
+    if not raw and not instance._state.adding:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image'
+            ).first() or (None, '')
+        )
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+        feeds.push_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change(AuthorStats, instance.author_id, 'posts_count', 1)
+        counters.change(Group, instance.group_id, 'posts_count', 1)
+    elif instance._previous_group_id != instance.group_id:
+        counters.change(
+            Group, instance._previous_group_id, 'posts_count', -1
+        )
+        counters.change(Group, instance.group_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def forget_author_feed(sender, instance, **kwargs):
+    feeds.forget_author(instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.change(AuthorStats, instance.author_id, 'posts_count', -1)
+    counters.change(Group, instance.group_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def reference_image(sender, instance, raw=False, **kwargs):
+    if raw or instance._previous_image == instance.image.name:
+        return
+    refcounts.acquire(instance.image.name)
+    refcounts.release(instance._previous_image)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    refcounts.release(instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change(Post, instance.post_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change(Post, instance.post_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.user_id and instance.author_id:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change(
+            AuthorStats, instance.author_id, 'followers_count', 1
+        )
+        counters.change(AuthorStats, instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.change(AuthorStats, instance.author_id, 'followers_count', -1)
+    counters.change(AuthorStats, instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    scopes = page_cache.post_scopes(instance)
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id and previous_group_id != instance.group_id:
+        scopes.extend(
+            f'group:{slug}' for slug in Group.objects.filter(
+                pk=previous_group_id
+            ).values_list('slug', flat=True)
+        )
+    page_cache.bump_on_commit(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        page_cache.bump_on_commit(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    scopes = ['index', f'group:{instance.slug}']
+    previous = getattr(instance, '_previous_group', None)
+    if previous and previous != (instance.slug, instance.title):
+        scopes.append(f'group:{previous[0]}')
+        scopes.extend(
+            f'profile:{username}' for username in User.objects.filter(
+                posts__group=instance
+            ).distinct().values_list('username', flat=True)
+        )
+    page_cache.bump_on_commit(*scopes)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_pages(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_names', None)
+    names = tuple(getattr(instance, name) for name in NAMES)
+    if raw or created or previous is None or previous == names:
+        return
+    page_cache.bump_on_commit(
+        'index',
+        f'profile:{previous[0]}',
+        f'profile:{instance.username}',
+        *(
+            f'group:{slug}' for slug in Group.objects.filter(
+                posts__author=instance
+            ).distinct().values_list('slug', flat=True)
+        ),
+        *(
+            f'post:{post_id}' for post_id in Comment.objects.filter(
+                author=instance
+            ).order_by().values_list('post_id', flat=True).distinct()
+        )
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        page_cache.bump_on_commit(*(
+            f'profile:{user.username}'
+            for user in User.objects.filter(
+                pk__in=(instance.user_id, instance.author_id)
+            )
+        ))
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.unindex_comment(instance.pk)
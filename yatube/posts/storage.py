@@ -0,0 +1,49 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранит файлы под именем sha256 содержимого, разложенные
+    по вложенным каталогам: posts/ab/cd/abcd....jpg.
+    Одинаковые загрузки пишутся на диск один раз,
+    число ссылок на файл ведёт таблица StoredFile.
+    Сохранять файл нужно в транзакции вместе с постом,
+    иначе refcounts.lock() не защитит его от удаления.
+    """
+    shard_depth = 2
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        shards = [
+            digest[level * 2:level * 2 + 2]
+            for level in range(self.shard_depth)
+        ]
+        return '/'.join(
+            part for part in (directory, *shards, digest + extension) if part
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        # refcounts импортирует модели, а модели - это хранилище
+        from posts import refcounts
+        refcounts.lock(name)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
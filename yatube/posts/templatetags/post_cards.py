@@ -0,0 +1,76 @@
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import single_flight
+from posts import page_shell, thumbnails
+
+register = template.Library()
+
+CARD_KEY = 'post_card:{}:{}'
+EDIT_BUTTON_SLOT = '<!--edit-button-->'
+THUMBNAIL_PENDING = 'thumbnail-pending'
+
+
+def card_key(post):
+    """Ключ карточки: id поста и хэш всего, что в ней выводится."""
+    group = post.group if post.group_id else None
+    content = '|'.join(str(value) for value in (
+        post.text,
+        post.image.name,
+        post.pub_date.isoformat(),
+        post.author.get_full_name(),
+        group and group.title,
+        group and group.slug,
+        settings.CARD_IMAGE_WIDTHS,
+    ))
+    digest = hashlib.md5(content.encode()).hexdigest()
+    return CARD_KEY.format(post.pk, digest)
+
+
+@register.simple_tag
+def prefetch_cards(posts):
+    """
+    Достаёт из кэша карточки всей страницы одним get_many,
+    а для несобранных карточек одним чтением находит картинки.
+    """
+    keys = [card_key(post) for post in posts]
+    cards = single_flight.values(cache.get_many(keys))
+    thumbnails.attach_card_images(
+        [post for post, key in zip(posts, keys) if key not in cards]
+    )
+    return cards
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post, cards=None):
+    """
+    Карточка поста из кэша фрагментов.
+    Кнопка редактирования зависит от зрителя
+    и подставляется после кэша, в оболочке страницы - меткой.
+    """
+    key = card_key(post)
+    html = cards.get(key) if isinstance(cards, dict) else None
+    if html is None:
+        def render():
+            if not hasattr(post, 'card_image'):
+                thumbnails.attach_card_images([post])
+            return render_to_string(
+                'posts/includes/post_card.html', {'post': post}
+            )
+
+        html = single_flight.get_or_recompute(
+            key,
+            render,
+            settings.CARD_CACHE_TIMEOUT,
+            cacheable=lambda html: THUMBNAIL_PENDING not in html
+        )
+    button = page_shell.slot(
+        context, 'posts/includes/edit_button.html',
+        post_id=post.pk, author_id=post.author_id
+    )
+    return mark_safe(html.replace(EDIT_BUTTON_SLOT, button))
@@ -0,0 +1,24 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts import page_shell
+from posts.models import Follow
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def viewer_slot(context, template_name, **params):
+    """
+    Часть страницы, зависящая от зрителя. В закэшированной
+    оболочке остаётся меткой и рендерится на каждый запрос.
+    """
+    return mark_safe(page_shell.slot(context, template_name, **params))
+
+
+@register.simple_tag(takes_context=True)
+def is_following(context, author_id):
+    user = context.get('user')
+    if user is None or not user.is_authenticated:
+        return False
+    return Follow.objects.filter(user=user, author_id=author_id).exists()
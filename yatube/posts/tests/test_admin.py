@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.paginators import EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class TestAdmin(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='AdminUser', email='admin@example.com', password='pass'
+        )
+        cls.users = [
+            User.objects.create(username=f'AdminTestUser{num}')
+            for num in range(5)
+        ]
+        cls.group = Group.objects.create(
+            title='Группа админки',
+            slug='admin-slug',
+            description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(text=f'Пост {num}', author=user,
+                                group=cls.group)
+            for num, user in enumerate(cls.users)
+        ]
+        Comment.objects.create(
+            text='Комментарий', author=cls.users[0], post=cls.posts[0]
+        )
+        Follow.objects.create(user=cls.users[0], author=cls.users[1])
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_changelists_do_not_list_users(self):
+        """Списки не выводят <select> со всеми пользователями"""
+        for model in ('post', 'comment', 'follow'):
+            with self.subTest(model=model):
+                response = self.client.get(
+                    reverse(f'admin:posts_{model}_changelist')
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertNotContains(
+                    response, f'>{self.users[-1].username}</option>'
+                )
+
+    def test_remove_from_group_action(self):
+        """Действие убирает посты из группы и пересчитывает счётчик"""
+        self.client.post(
+            reverse('admin:posts_post_changelist'),
+            {
+                'action': 'remove_from_group',
+                '_selected_action': [post.pk for post in self.posts[:3]],
+            }
+        )
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 2)
+        self.assertEqual(Post.objects.filter(group=None).count(), 3)
+
+    def test_remove_from_group_invalidates_pages(self):
+        """После действия профиль и пост автора не показывают группу"""
+        post = self.posts[0]
+        urls = (
+            reverse('posts:profile', kwargs={'username': post.author}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        )
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        self.client.post(
+            reverse('admin:posts_post_changelist'),
+            {'action': 'remove_from_group', '_selected_action': [post.pk]}
+        )
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertNotContains(response, self.group.title)
+
+    def test_estimated_paginator_after_deletes(self):
+        """Завышенная после удалений оценка не даёт пустых страниц"""
+        Post.objects.filter(
+            pk__in=[post.pk for post in self.posts[:3]]
+        ).delete()
+        paginator = EstimatedCountPaginator(Post.objects.order_by('pk'), 2)
+        self.assertGreater(paginator.num_pages, 1)
+        page = paginator.page(paginator.num_pages)
+        self.assertEqual(page.number, 1)
+        self.assertEqual(list(page), self.posts[3:])
+        self.assertEqual(paginator.count, 2)
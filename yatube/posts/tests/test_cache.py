@@ -1,9 +1,15 @@
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse_lazy
 
-from posts.models import Post
+from posts import page_cache, views
+from posts.models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -15,11 +21,30 @@ class TestCache(TestCase):
         cls.user = User.objects.create_user(
             username='CacheTestUser'
         )
+        cls.group = Group.objects.create(
+            title='Группа кэша',
+            slug='cache-slug',
+            description='Описание'
+        )
 
     def setUp(self) -> None:
         super().setUp()
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
+        self.urls = (
+            reverse_lazy('posts:index'),
+            reverse_lazy('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse_lazy(
+                'posts:profile',
+                kwargs={'username': self.user.username}
+            ),
+        )
+
+    def get_pages(self):
+        return [
+            self.authorized_client.get(url).content for url in self.urls
+        ]
 
     def test_cache(self):
         """
@@ -27,33 +52,368 @@ class TestCache(TestCase):
         """
         post = Post.objects.create(
             text='TestCacheText',
-            author=self.user
+            author=self.user,
+            group=self.group
         )
 
-        response = self.authorized_client.get(
-            reverse_lazy('posts:index')
+        pages = self.get_pages()
+
+        # update() не шлёт сигналов, поэтому страницы остаются в кэше
+        Post.objects.filter(id=post.id).update(text='ChangedText')
+
+        self.assertEqual(
+            pages,
+            self.get_pages(),
+            'Страница кэшируется неверно'
         )
 
-        Post.objects.filter(id=post.id).delete()
+        cache.clear()
 
-        response_after_delete = self.authorized_client.get(
-            reverse_lazy('posts:index')
+        self.assertNotEqual(
+            pages,
+            self.get_pages(),
+            'Кэш страницы не удаляется'
         )
 
-        self.assertEqual(
-            response.content,
-            response_after_delete.content,
-            'Страница кэшируется неверно'
+    def test_new_post_invalidates_pages(self):
+        """Новый пост сразу виден на главной, в группе и в профиле"""
+        self.get_pages()
+        Post.objects.create(
+            text='FreshCacheText',
+            author=self.user,
+            group=self.group
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.authorized_client.get(url), 'FreshCacheText'
+                )
+
+    def test_deleted_post_invalidates_pages(self):
+        """Удалённый пост сразу пропадает со страниц"""
+        post = Post.objects.create(
+            text='DeletedCacheText',
+            author=self.user,
+            group=self.group
+        )
+        self.get_pages()
+        post.delete()
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertNotContains(
+                    self.authorized_client.get(url), 'DeletedCacheText'
+                )
+
+    def test_unrelated_changes_keep_cache(self):
+        """Комментарий не сбрасывает кэш списков"""
+        post = Post.objects.create(text='CommentedText', author=self.user)
+        pages = self.get_pages()
+        Post.objects.filter(id=post.id).update(text='ChangedText')
+        Comment.objects.create(text='Комментарий', author=self.user, post=post)
+        self.assertEqual(pages, self.get_pages())
+
+    def test_renamed_author_invalidates_pages(self):
+        """Новое имя автора сразу видно на страницах с его постами"""
+        Post.objects.create(
+            text='RenamedText', author=self.user, group=self.group
+        )
+        self.get_pages()
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Переименованный'
+        author.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.authorized_client.get(url), 'Переименованный'
+                )
+
+    def test_renamed_group_invalidates_profiles(self):
+        """Новое название группы сразу видно в профилях её авторов"""
+        Post.objects.create(
+            text='GroupText', author=self.user, group=self.group
+        )
+        self.get_pages()
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        self.assertContains(
+            self.authorized_client.get(self.urls[2]), 'Новое название'
         )
 
+    def test_bumps_again_after_commit(self):
+        """
+        Версии меняются и после коммита: страница, отрисованная
+        до коммита под новой версией, не остаётся в кэше
+        """
+        with mock.patch(
+            'posts.page_cache.transaction.on_commit'
+        ) as on_commit:
+            Post.objects.create(text='Текст', author=self.user)
+        versions = page_cache.get_versions(['index'])
+        for call in on_commit.call_args_list:
+            call[0][0]()
+        self.assertNotEqual(versions, page_cache.get_versions(['index']))
+
+    def test_renamed_commenter_invalidates_post_page(self):
+        """Новое имя комментатора сразу видно на странице поста"""
+        other = User.objects.create_user(username='OtherAuthor')
+        post = Post.objects.create(text='Текст', author=other)
+        Comment.objects.create(text='Комментарий', author=self.user, post=post)
+        url = reverse_lazy('posts:post_detail', kwargs={'post_id': post.pk})
+        etag = self.authorized_client.get(url)['ETag']
+        commenter = User.objects.get(pk=self.user.pk)
+        commenter.username = 'RenamedCommenter'
+        commenter.save()
+        self.authorized_client.force_login(commenter)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'RenamedCommenter')
+
+    def test_version_keys_are_hashed(self):
+        """Кириллица в области не попадает в ключ кэша"""
+        self.assertRegex(
+            page_cache.version_key('group:Тестовый слаг'),
+            r'^page_version:[0-9a-f]{32}$'
+        )
+
+    def test_pages_are_cached_per_user(self):
+        """Закэшированная страница не показывается другому пользователю"""
+        self.get_pages()
+        guest_page = Client().get(self.urls[0])
+        self.assertNotContains(guest_page, self.user.username)
+
+
+class TestConditionalGet(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='ConditionalUser')
+        cls.group = Group.objects.create(
+            title='Группа', slug='conditional-slug', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Текст', author=cls.user, group=cls.group
+        )
+
+    def setUp(self) -> None:
+        super().setUp()
         cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.urls = (
+            reverse_lazy('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse_lazy(
+                'posts:profile', kwargs={'username': self.user.username}
+            ),
+            reverse_lazy(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}
+            ),
+        )
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304 без страницы"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
 
-        response_after_cache_clear = self.authorized_client.get(
-            reverse_lazy('posts:index')
+    def test_changes_update_etag(self):
+        """Правка поста и новый комментарий меняют ETag"""
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        self.post.text = 'Новый текст'
+        self.post.save()
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+        etag = self.client.get(self.urls[2])['ETag']
+        Comment.objects.create(text='Ответ', author=self.user, post=self.post)
+        response = self.client.get(self.urls[2], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_per_user(self):
+        """ETag гостя не подходит авторизованному пользователю"""
+        etag = Client().get(self.urls[1])['ETag']
+        response = self.client.get(self.urls[1], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_last_modified(self):
+        """Страница поста отвечает 304 на If-Modified-Since"""
+        response = self.client.get(self.urls[2])
+        response = self.client.get(
+            self.urls[2], HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
         )
+        self.assertEqual(response.status_code, 304)
 
-        self.assertNotEqual(
-            response.content,
-            response_after_cache_clear.content,
-            'Кэш страницы не удаляется'
+
+class TestAnonymousPageCache(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='AnonCacheUser')
+        cls.group = Group.objects.create(
+            title='Группа', slug='anon-slug', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Гостевой текст', author=cls.user, group=cls.group
+        )
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.guest_client = Client()
+        self.urls = (
+            reverse_lazy('posts:index'),
+            reverse_lazy('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse_lazy(
+                'posts:profile', kwargs={'username': self.user.username}
+            ),
+            reverse_lazy(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}
+            ),
+            reverse_lazy('about:author'),
+        )
+
+    def test_hit_without_queries(self):
+        """Повторный запрос гостя отдаётся из кэша без запросов к БД"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                self.assertIn('public', first['Cache-Control'])
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(url)
+                self.assertEqual(response.content, first.content)
+
+    def test_bump_during_render_not_cached(self):
+        """Страница, во время рендера которой сменилась версия, не отдаётся"""
+        render = views.IndexView.get_context_data
+
+        def render_and_bump(view, **kwargs):
+            context = render(view, **kwargs)
+            page_cache.bump('index')
+            return context
+
+        with mock.patch.object(
+            views.IndexView, 'get_context_data', render_and_bump
+        ):
+            self.guest_client.get(self.urls[0])
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(self.urls[0])
+        self.assertTrue(queries.captured_queries)
+
+    def test_normalized_query(self):
+        """Порядок и пустые параметры не порождают новых ключей"""
+        self.guest_client.get(self.urls[0], {'page': 1, 'q': ''})
+        with self.assertNumQueries(0):
+            self.guest_client.get(f'{self.urls[0]}?q=&page=1')
+
+    def test_changes_invalidate(self):
+        """Изменение поста сразу видно гостям"""
+        for url in self.urls[:4]:
+            self.guest_client.get(url)
+        self.post.text = 'Исправленный текст'
+        self.post.save()
+        for url in self.urls[:4]:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.guest_client.get(url), 'Исправленный текст'
+                )
+
+    def test_session_bypasses_cache(self):
+        """С cookie сессии кэш гостей не используется"""
+        self.guest_client.get(self.urls[0])
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(self.urls[0])
+        self.assertContains(response, self.user.username)
+        self.assertIn('private', response['Cache-Control'])
+
+
+class TestPageShell(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='ShellAuthor')
+        cls.reader = User.objects.create_user(username='ShellReader')
+        cls.post = Post.objects.create(text='Текст', author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.url = reverse_lazy(
+            'posts:profile', kwargs={'username': self.author.username}
+        )
+
+    def test_shell_is_shared(self):
+        """Оболочка страницы кэшируется одна на всех пользователей"""
+        self.author_client.get(self.url)
+        with mock.patch(
+            'posts.views.ProfileView.get_queryset'
+        ) as get_queryset:
+            response = self.reader_client.get(self.url)
+        get_queryset.assert_not_called()
+        self.assertContains(response, 'Пользователь: ShellReader')
+        self.assertNotContains(response, 'Пользователь: ShellAuthor')
+
+    def test_viewer_parts(self):
+        """Кнопки правки и подписки рендерятся для каждого зрителя"""
+        author_page = self.author_client.get(self.url)
+        reader_page = self.reader_client.get(self.url)
+        self.assertContains(author_page, 'Редактировать пост')
+        self.assertNotContains(author_page, 'Отписаться')
+        self.assertNotContains(reader_page, 'Редактировать пост')
+        self.assertContains(reader_page, 'Отписаться')
+        self.assertNotContains(reader_page, 'viewer-slot')
+
+
+class TestCacheKeyQuery(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='QueryUser')
+        for num in range(settings.PER_PAGE + 1):
+            Post.objects.create(text=f'Пост {num}', author=cls.user)
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse_lazy('posts:index')
+
+    def test_equivalent_queries_share_entry(self):
+        """Лишние параметры, page=1 и ведущие нули не дают новых ключей"""
+        self.client.get(self.url, {'utm_source': 'x'})
+        for query in ({}, {'page': '1'}, {'page': '01', 'ref': 'bot'}):
+            with self.subTest(query=query):
+                with mock.patch(
+                    'posts.views.IndexView.get_queryset'
+                ) as get_queryset:
+                    self.client.get(self.url, query)
+                get_queryset.assert_not_called()
+
+    def test_junk_not_in_links(self):
+        """Отброшенные параметры не попадают в ссылки пагинатора"""
+        response = self.client.get(self.url, {'utm_source': 'x'})
+        self.assertContains(response, 'page=2')
+        self.assertNotContains(response, 'utm_source')
+
+    def test_out_of_range_not_cached(self):
+        """Страница вне диапазона отвечает 404 и не кэшируется"""
+        self.assertEqual(
+            self.client.get(self.url, {'page': 999}).status_code, 404
+        )
+        self.assertEqual(
+            Client().get(self.url, {'page': 999}).status_code, 404
+        )
+        request = RequestFactory().get(self.url, {'page': 999})
+        self.assertIsNone(
+            cache.get(page_cache.page_key(request, 'index_page'))
         )
+        self.assertIsNone(cache.get('anon_page:/?page=999'))
@@ -0,0 +1,109 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse_lazy
+
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class TestCounters(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(username='CounterAuthor')
+        cls.reader = User.objects.create(username='CounterReader')
+        cls.group = Group.objects.create(
+            title='Группа счётчиков',
+            slug='counter-slug',
+            description='Описание'
+        )
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_post_and_comment_counters(self):
+        """Счётчики постов и комментариев меняются при создании и удалении"""
+        self.author_client.post(
+            reverse_lazy('posts:post_create'),
+            data={'text': 'Пост', 'group': self.group.id}
+        )
+        post = Post.objects.get(text='Пост')
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(len(self.group), 1)
+
+        self.reader_client.post(
+            reverse_lazy('posts:add_comment', kwargs={'post_id': post.id}),
+            data={'text': 'Комментарий'}
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+        post.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_follow_counters(self):
+        """Счётчики подписок меняются при подписке и отписке"""
+        kwargs = {'username': self.author.username}
+        self.reader_client.get(
+            reverse_lazy('posts:profile_follow', kwargs=kwargs)
+        )
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+
+        self.reader_client.get(
+            reverse_lazy('posts:profile_unfollow', kwargs=kwargs)
+        )
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_reconcile_repairs_drift(self):
+        """reconcile_counters находит и исправляет расхождения"""
+        # По две строки на ключ: группировка не должна дробить счёт
+        post = Post.objects.create(text='Пост', author=self.author)
+        Post.objects.create(text='Второй пост', author=self.author)
+        for text in ('Текст', 'Ещё текст'):
+            Comment.objects.create(text=text, author=self.reader, post=post)
+        other = User.objects.create(username='CounterOther')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        Follow.objects.create(user=self.reader, author=other)
+        AuthorStats.objects.filter(user=self.author).update(
+            posts_count=42, followers_count=0
+        )
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        AuthorStats.objects.filter(user=self.reader).delete()
+
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        self.assertEqual(self.stats(self.author).followers_count, 2)
+        self.assertEqual(self.stats(self.reader).following_count, 2)
+
+    def test_dry_run_reports_missing_stats(self):
+        """--dry-run считает пользователей без счётчиков и не создаёт их"""
+        AuthorStats.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('reconcile_counters', dry_run=True, stdout=out)
+        self.assertIn('Найдено расхождений: 1', out.getvalue())
+        self.assertFalse(AuthorStats.objects.filter(user=self.reader).exists())
+
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('Исправлено расхождений: 1', out.getvalue())
+        self.assertTrue(AuthorStats.objects.filter(user=self.reader).exists())
@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class TestExport(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='Exporter')
+        cls.other = User.objects.create(username='Other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='export-slug', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Выгружаемый пост', author=cls.user, group=cls.group
+        )
+        Comment.objects.create(
+            text='Свой комментарий', author=cls.user, post=cls.post
+        )
+        Follow.objects.create(user=cls.user, author=cls.other)
+        Follow.objects.create(user=cls.other, author=cls.user)
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get_export(self, username, **params):
+        return self.client.get(
+            reverse('posts:profile_export', kwargs={'username': username}),
+            params
+        )
+
+    def test_jsonl(self):
+        """Выгрузка JSONL отдаётся потоком в формате импорта"""
+        response = self.get_export(self.user.username)
+        self.assertTrue(response.streaming)
+        records = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [record['model'] for record in records],
+            ['group', 'post', 'comment', 'follow', 'follow']
+        )
+        self.assertEqual(records[1]['id'], self.post.pk)
+        self.assertEqual(records[1]['group'], self.group.slug)
+        self.assertEqual(
+            {(record['user'], record['author']) for record in records[3:]},
+            {('Exporter', 'Other'), ('Other', 'Exporter')}
+        )
+
+    def test_csv(self):
+        """CSV содержит заголовок и строку на каждую запись"""
+        response = self.get_export(self.user.username, format='csv')
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1]['text'], 'Выгружаемый пост')
+
+    def test_only_owner(self):
+        """Чужую выгрузку и неизвестный формат получить нельзя"""
+        self.assertEqual(self.get_export(self.other.username).status_code, 404)
+        self.assertEqual(
+            self.get_export(self.user.username, format='xml').status_code,
+            404
+        )
+
+    def test_command(self):
+        """Команда пишет ту же выгрузку в stdout"""
+        out = StringIO()
+        call_command('yatube_export', self.user.username, stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 5)
@@ -0,0 +1,87 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Max
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse_lazy
+
+from posts.feeds import (MergedFeed, author_feed_key, get_author_feeds,
+                         merge_post_ids)
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+class TestMergedFeed(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create(username='MergeReader')
+        cls.authors = [
+            User.objects.create(username=f'MergeAuthor{num}')
+            for num in range(3)
+        ]
+        for num in range(5):
+            for author in cls.authors:
+                Post.objects.create(text=f'Пост {num}', author=author)
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.author_ids = [author.id for author in self.authors]
+        self.expected = list(
+            Post.objects.filter(author__in=self.authors)
+            .order_by('-pub_date', '-id')
+        )
+
+    def test_merge_matches_sql(self):
+        """Слияние списков авторов совпадает с SQL-запросом"""
+        feed = MergedFeed(self.author_ids)
+        self.assertEqual(feed[0:4], self.expected[:4])
+        self.assertEqual(feed[4:15], self.expected[4:])
+        self.assertEqual(feed.count(), len(self.expected))
+
+    @override_settings(AUTHOR_FEED_SIZE=2)
+    def test_truncated_lists_fall_back_to_sql(self):
+        """Усечённых списков не хватает - берём страницу из SQL"""
+        feeds = get_author_feeds(self.author_ids)
+        self.assertIsNotNone(merge_post_ids(feeds, 4))
+        self.assertIsNone(merge_post_ids(feeds, 10))
+        self.assertEqual(MergedFeed(self.author_ids)[0:10], self.expected[:10])
+
+    def test_new_post_reaches_warm_lists(self):
+        """Новый пост попадает в уже закэшированный список автора"""
+        MergedFeed(self.author_ids)[0:1]
+        post = Post.objects.create(text='Свежий пост', author=self.authors[0])
+        self.assertEqual(MergedFeed(self.author_ids)[0:1], [post])
+
+    @override_settings(FOLLOW_FEED_ENGINE='merge')
+    def test_benchmark_cleans_only_its_feeds(self):
+        """Бенчмарк не чистит весь кэш и не оставляет ленты отката"""
+        cache.set('unrelated', 'value')
+        last_id = User.objects.aggregate(last=Max('id'))['last']
+        call_command(
+            'bench_follow_feed', authors=[3], posts_per_author=2,
+            repeat=2, stdout=StringIO()
+        )
+        self.assertEqual(cache.get('unrelated'), 'value')
+        self.assertEqual(
+            cache.get_many(
+                author_feed_key(user_id)
+                for user_id in range(last_id + 1, last_id + 5)
+            ),
+            {}
+        )
+
+    def test_follow_index_uses_merge(self):
+        """Лента подписок работает через движок слияния"""
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse_lazy('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), self.expected[:10]
+        )
@@ -90,7 +90,8 @@ class PostsFormTests(TestCase):
                 author=self.user,
                 text=form_data['text'],
                 group=self.group,
-                image='posts/small.gif'
+                image__startswith='posts/',
+                image__endswith='.gif'
             ).exists()
         )
 
@@ -0,0 +1,141 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from posts import page_cache
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+from posts.search import SearchResults
+
+User = get_user_model()
+
+RECORDS = [
+    {'model': 'group', 'slug': 'imported', 'title': 'Импорт'},
+    {'model': 'post', 'id': 500, 'author': 'writer', 'group': 'imported',
+     'text': 'Перенесённый пост', 'pub_date': '2020-01-02T03:04:05'},
+    {'model': 'post', 'id': 501, 'author': 'writer',
+     'text': 'Второй пост', 'pub_date': '2020-01-03T00:00:00+00:00'},
+    {'model': 'comment', 'post': 500, 'author': 'reader',
+     'text': 'Комментарий из архива'},
+    {'model': 'comment', 'post': 999, 'author': 'reader',
+     'text': 'К несуществующему посту'},
+    {'model': 'follow', 'user': 'reader', 'author': 'writer'},
+]
+
+
+class TestImport(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        handle, self.path = tempfile.mkstemp(suffix='.jsonl')
+        with os.fdopen(handle, 'w', encoding='utf-8') as file_:
+            for record in RECORDS:
+                file_.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def tearDown(self) -> None:
+        os.remove(self.path)
+        super().tearDown()
+
+    def test_import(self):
+        """Импорт создаёт записи, сохраняя даты и связи"""
+        call_command(
+            'yatube_import', self.path, batch_size=2, stdout=StringIO()
+        )
+        writer = User.objects.get(username='writer')
+        reader = User.objects.get(username='reader')
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.author, writer)
+        self.assertEqual(post.group, Group.objects.get(slug='imported'))
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(Comment.objects.get().post, post)
+        self.assertTrue(
+            Follow.objects.filter(user=reader, author=writer).exists()
+        )
+        self.assertEqual(writer.stats.posts_count, 2)
+        self.assertEqual(reader.stats.following_count, 1)
+        self.assertEqual(
+            Post.objects.get(pk=500).comments_count, 1
+        )
+        self.assertEqual(Group.objects.get(slug='imported').posts_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=reader).count(), 2
+        )
+        self.assertEqual(
+            [found.pk for found in SearchResults('архива')[:10]], [500]
+        )
+        new_post = Post.objects.create(text='Новый', author=writer)
+        self.assertGreater(new_post.pk, 501)
+
+    def test_invalid_record(self):
+        """Некорректная строка останавливает импорт с номером строки"""
+        with open(self.path, 'a', encoding='utf-8') as file_:
+            file_.write('{"model": "post", "text": "без автора"}\n')
+        with self.assertRaisesMessage(CommandError, 'Строка 7'):
+            call_command('yatube_import', self.path, stdout=StringIO())
+
+    def test_comment_before_its_post(self):
+        """Комментарий, чей пост идёт позже во входе, не теряется"""
+        with open(self.path, 'w', encoding='utf-8') as file_:
+            for record in (RECORDS[3], RECORDS[0], RECORDS[1]):
+                file_.write(json.dumps(record, ensure_ascii=False) + '\n')
+        out = StringIO()
+        call_command('yatube_import', self.path, batch_size=1, stdout=out)
+        self.assertEqual(Comment.objects.get().post_id, 500)
+        self.assertEqual(Post.objects.get(pk=500).comments_count, 1)
+        self.assertIn('comment  записано 1, пропущено 0', out.getvalue())
+
+    def test_empty_author(self):
+        """Пустой автор останавливает импорт с номером строки"""
+        with open(self.path, 'a', encoding='utf-8') as file_:
+            file_.write('{"model": "post", "author": "", "text": "x"}\n')
+        with self.assertRaisesMessage(CommandError, 'Строка 7'):
+            call_command('yatube_import', self.path, stdout=StringIO())
+
+    def test_reimport_writes_nothing(self):
+        """Повторный импорт не считает существующие строки записанными"""
+        with open(self.path, 'w', encoding='utf-8') as file_:
+            for record in RECORDS:
+                if record['model'] == 'comment':
+                    record = {'id': record['post'], **record}
+                file_.write(json.dumps(record, ensure_ascii=False) + '\n')
+        call_command('yatube_import', self.path, stdout=StringIO())
+        out = StringIO()
+        call_command('yatube_import', self.path, stdout=out)
+        for model in ('group', 'post', 'comment', 'follow'):
+            self.assertIn(f'{model:<8} записано 0', out.getvalue())
+        self.assertIn('comment  записано 0, пропущено 2', out.getvalue())
+
+    def test_keeps_unrelated_cache(self):
+        """Импорт сбрасывает только страницы затронутых записей"""
+        cache.set('unrelated', 'value')
+        outsider = User.objects.create_user(username='outsider')
+        versions = page_cache.get_versions(
+            ('index', 'profile:writer', f'profile:{outsider.username}')
+        )
+        call_command('yatube_import', self.path, stdout=StringIO())
+        self.assertEqual(cache.get('unrelated'), 'value')
+        index, writer, other = versions.split('.')
+        new_index, new_writer, new_other = page_cache.get_versions(
+            ('index', 'profile:writer', f'profile:{outsider.username}')
+        ).split('.')
+        self.assertNotEqual(index, new_index)
+        self.assertNotEqual(writer, new_writer)
+        self.assertEqual(other, new_other)
+
+    def test_bumps_again_after_commit(self):
+        """Страницы пачки сбрасываются и после коммита её транзакции"""
+        with mock.patch(
+            'posts.page_cache.transaction.on_commit'
+        ) as on_commit:
+            call_command('yatube_import', self.path, stdout=StringIO())
+        versions = page_cache.get_versions(['index', 'profile:writer'])
+        for call in on_commit.call_args_list:
+            call[0][0]()
+        self.assertNotEqual(
+            versions, page_cache.get_versions(['index', 'profile:writer'])
+        )
@@ -1,11 +1,18 @@
 import time
 
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.paginator import EmptyPage
+from django.db import connection
+from django.http import Http404
+from django.test import Client, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from posts import views
 from posts.models import Follow, Group, Post
+from posts.paginators import CountFreePaginator
 from yatube.settings import PER_PAGE
 
 User = get_user_model()
@@ -98,3 +105,94 @@ class TestPaginatorView(TestCase):
                     Post.objects.all().count()
                     - PER_PAGE
                 )
+
+
+class TestCursorPaginator(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='CursorTestUser')
+        cls.posts = [
+            Post.objects.create(text='Text' + str(num), author=cls.user)
+            for num in range(13)
+        ]
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.factory = RequestFactory()
+        self.view = views.ProfileView.as_view(
+            template_name='posts/profile.html',
+            cursor_pagination=True
+        )
+
+    def get_page(self, cursor=None):
+        request = self.factory.get(
+            '/', {'cursor': cursor} if cursor else {}
+        )
+        request.user = AnonymousUser()
+        response = self.view(request, username=self.user.username)
+        response.render()
+        return response.context_data['page_obj']
+
+    def test_pages_follow_post_ordering(self):
+        """Курсоры обходят ленту в порядке (-pub_date, -id) без пропусков"""
+        expected = list(
+            Post.objects.filter(author=self.user).order_by('-pub_date', '-id')
+        )
+        first_page = self.get_page()
+        self.assertEqual(list(first_page), expected[:PER_PAGE])
+        self.assertFalse(first_page.has_previous())
+
+        second_page = self.get_page(first_page.next_cursor)
+        self.assertEqual(list(second_page), expected[PER_PAGE:])
+        self.assertFalse(second_page.has_next())
+
+        back_page = self.get_page(second_page.previous_cursor)
+        self.assertEqual(list(back_page), expected[:PER_PAGE])
+
+    def test_invalid_cursor(self):
+        """Некорректный курсор приводит к 404"""
+        with self.assertRaises(Http404):
+            self.get_page('not-a-cursor')
+
+
+class TestCountFreePaginator(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='CountFreeUser')
+        Post.objects.bulk_create(
+            Post(text='Text' + str(num), author=cls.user)
+            for num in range(95)
+        )
+
+    def test_no_count_query(self):
+        """Страница берётся одним запросом без COUNT(*)"""
+        paginator = CountFreePaginator(Post.objects.all(), PER_PAGE)
+        with CaptureQueriesContext(connection) as queries:
+            page = paginator.page(5)
+            page.has_next()
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT', queries[0]['sql'])
+        self.assertEqual(len(page), PER_PAGE)
+        self.assertEqual(paginator.num_pages, 6)
+
+    def test_last_page(self):
+        """Последняя страница определяется по отсутствию лишней строки"""
+        paginator = CountFreePaginator(Post.objects.all(), PER_PAGE)
+        page = paginator.page(10)
+        self.assertFalse(page.has_next())
+        self.assertEqual(len(page), 5)
+        with self.assertRaises(EmptyPage):
+            paginator.page(11)
+
+    def test_elided_window(self):
+        """Окно страниц с пропусками вместо полного списка"""
+        paginator = CountFreePaginator(
+            Post.objects.all(), PER_PAGE, count=95
+        )
+        paginator.page(5)
+        self.assertEqual(
+            paginator.page_window,
+            [1, paginator.ELLIPSIS, 3, 4, 5, 6, 7, paginator.ELLIPSIS, 10]
+        )
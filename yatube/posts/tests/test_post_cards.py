@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import Client, TestCase
+from django.urls import reverse_lazy
+
+from posts.models import Post
+from posts.templatetags.post_cards import card_key
+
+User = get_user_model()
+
+
+class TestPostCards(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(username='CardAuthor')
+        cls.reader = User.objects.create(username='CardReader')
+        cls.posts = [
+            Post.objects.create(text=f'Карточка {num}', author=cls.author)
+            for num in range(3)
+        ]
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.url = reverse_lazy(
+            'posts:profile', kwargs={'username': self.author.username}
+        )
+
+    def test_cards_are_cached(self):
+        """Карточки кладутся в кэш и берутся одним get_many"""
+        self.author_client.get(self.url)
+        for post in self.posts:
+            with self.subTest(post=post):
+                self.assertIsNotNone(cache.get(card_key(post)))
+        with mock.patch(
+            'posts.templatetags.post_cards.render_to_string',
+            wraps=render_to_string
+        ) as rendered:
+            self.reader_client.get(self.url)
+        self.assertFalse(
+            any(
+                call[0][0] == 'posts/includes/post_card.html'
+                for call in rendered.call_args_list
+            ),
+            'Закэшированные карточки не должны рендериться заново'
+        )
+
+    def test_edit_button_is_per_viewer(self):
+        """Кнопка редактирования не попадает в общий фрагмент"""
+        self.author_client.get(self.url)
+        self.assertContains(
+            self.author_client.get(self.url), 'Редактировать пост'
+        )
+        self.assertNotContains(
+            self.reader_client.get(self.url), 'Редактировать пост'
+        )
+
+    def test_edit_changes_card_key(self):
+        """Изменение текста меняет ключ карточки"""
+        post = self.posts[0]
+        old_key = card_key(post)
+        post.text = 'Новый текст'
+        self.assertNotEqual(old_key, card_key(post))
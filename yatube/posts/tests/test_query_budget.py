@@ -0,0 +1,107 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import urls
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Допустимое число SQL-запросов на GET-запрос авторизованного пользователя.
+# Каждый новый маршрут в posts/urls.py обязан объявить здесь свой бюджет.
+QUERY_BUDGETS = {
+    'index': 4,
+    'group_list': 4,
+    'profile': 5,
+    'post_detail': 5,
+    'post_create': 3,
+    'post_edit': 4,
+    'add_comment': 5,
+    'search': 5,
+    'follow_index': 4,
+    'profile_follow': 6,
+    'profile_unfollow': 11,
+    'profile_export': 7,
+}
+# Маршруты, которые на GET отвечают редиректом, остальные - 200
+REDIRECTS = ('profile_follow', 'profile_unfollow')
+
+
+class TestQueryBudget(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='BudgetUser')
+        cls.author = User.objects.create(username='BudgetAuthor')
+        cls.group = Group.objects.create(
+            title='Бюджетная группа',
+            slug='budget-slug',
+            description='Описание'
+        )
+        for num in range(15):
+            Post.objects.create(
+                text=f'Пост {num}',
+                author=cls.author if num % 2 else cls.user,
+                group=cls.group
+            )
+        cls.post = Post.objects.filter(author=cls.user).first()
+        for num in range(5):
+            Comment.objects.create(
+                text=f'Комментарий {num}',
+                author=cls.author,
+                post=cls.post
+            )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get_url(self, name):
+        kwargs = {
+            'slug': self.group.slug,
+            'username': (
+                self.user.username if name == 'profile_export'
+                else self.author.username
+            ),
+            'post_id': self.post.id,
+        }
+        pattern = next(
+            pattern for pattern in urls.urlpatterns if pattern.name == name
+        )
+        return reverse(
+            f'posts:{name}',
+            kwargs={
+                key: value for key, value in kwargs.items()
+                if key in pattern.pattern.converters
+            }
+        )
+
+    def test_every_url_has_budget(self):
+        """Для каждого маршрута posts объявлен бюджет запросов"""
+        for pattern in urls.urlpatterns:
+            with self.subTest(name=pattern.name):
+                self.assertIn(pattern.name, QUERY_BUDGETS)
+
+    def test_query_budgets(self):
+        """Страницы укладываются в объявленный бюджет запросов"""
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(name=name):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(self.get_url(name))
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                self.assertEqual(
+                    response.status_code, 302 if name in REDIRECTS else 200
+                )
+                self.assertLessEqual(
+                    len(queries),
+                    budget,
+                    f'{name}: {len(queries)} запросов при бюджете {budget}'
+                )
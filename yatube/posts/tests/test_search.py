@@ -0,0 +1,100 @@
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse_lazy
+
+from posts.models import Comment, Post
+from posts.search import SearchResults
+
+User = get_user_model()
+
+
+class TestSearch(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='SearchUser')
+        cls.exact_post = Post.objects.create(
+            text='Кошки и собаки',
+            author=cls.user
+        )
+        cls.noisy_post = Post.objects.create(
+            text='Про кошек здесь много слов, но собаки тоже встречаются, '
+                 'как и длинные рассуждения о погоде и прочем',
+            author=cls.user
+        )
+        cls.commented_post = Post.objects.create(
+            text='Пост без ключевых слов',
+            author=cls.user
+        )
+        Comment.objects.create(
+            text='А у меня дома живут собаки',
+            author=cls.user,
+            post=cls.commented_post
+        )
+
+    def test_search_by_post_and_comment_text(self):
+        """Поиск находит посты по тексту поста и комментариям"""
+        results = SearchResults('собаки')[0:10]
+        self.assertEqual(
+            set(results),
+            {self.exact_post, self.noisy_post, self.commented_post}
+        )
+        self.assertEqual(SearchResults('кошки собаки')[0:10][0],
+                         self.exact_post)
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении постов"""
+        post = Post.objects.create(text='Кошки', author=self.user)
+        post.text = 'Только попугаи'
+        post.save()
+        self.assertEqual(SearchResults('попугаи')[0:10], [post])
+        self.assertNotIn(post, SearchResults('кошки')[0:10])
+        post.delete()
+        self.assertEqual(SearchResults('попугаи')[0:10], [])
+
+    def test_unsafe_query(self):
+        """Спецсимволы FTS5 в запросе не ломают поиск"""
+        self.assertEqual(SearchResults('" OR (*')[0:10], [])
+
+    def test_search_view(self):
+        """Страница поиска показывает найденные посты"""
+        response = Client().get(
+            reverse_lazy('posts:search'), {'q': 'собаки'}
+        )
+        self.assertEqual(len(response.context['page_obj']), 3)
+        self.assertContains(response, 'Кошки и собаки')
+
+    def test_admin_search(self):
+        """Поиск в админке идёт через индекс"""
+        request = RequestFactory().get('/')
+        queryset, use_distinct = site._registry[Post].get_search_results(
+            request, Post.objects.all(), 'попугаи кошки'
+        )
+        self.assertFalse(queryset.exists())
+        queryset, use_distinct = site._registry[Post].get_search_results(
+            request, Post.objects.all(), 'собаки'
+        )
+        self.assertEqual(set(queryset), {self.exact_post, self.noisy_post})
+        queryset, use_distinct = site._registry[Comment].get_search_results(
+            request, Comment.objects.all(), 'дома'
+        )
+        self.assertEqual(queryset.count(), 1)
+
+    def test_admin_search_by_word_prefix(self):
+        """Поиск в админке находит слова по началу"""
+        request = RequestFactory().get('/')
+        queryset, use_distinct = site._registry[Post].get_search_results(
+            request, Post.objects.all(), 'Кош соба'
+        )
+        self.assertEqual(set(queryset), {self.exact_post, self.noisy_post})
+
+    def test_admin_search_without_words(self):
+        """Запрос из одних знаков препинания в админке ничего не находит"""
+        request = RequestFactory().get('/')
+        for model in (Post, Comment):
+            with self.subTest(model=model.__name__):
+                queryset, use_distinct = site._registry[
+                    model
+                ].get_search_results(request, model.objects.all(), '!!!')
+                self.assertFalse(queryset.exists())
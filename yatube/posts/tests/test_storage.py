@@ -0,0 +1,111 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default
+
+from posts import thumbnails
+from posts.models import Post, StoredFile
+from posts.refcounts import storage
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OTHER_GIF = SMALL_GIF[:-3] + b'\x0B\x00\x3B'
+
+
+def uploaded(content=SMALL_GIF, name='Meme.GIF'):
+    return SimpleUploadedFile(name, content, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@mock.patch('posts.refcounts.transaction.on_commit', lambda func: func())
+class TestContentAddressedStorage(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(username='StorageAuthor')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, content=SMALL_GIF):
+        return Post.objects.create(
+            text='Мем', author=self.author, image=uploaded(content)
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        """Одинаковые загрузки хранятся одним файлом в шардах по хэшу"""
+        first, second = self.create_post(), self.create_post()
+        self.assertEqual(first.image.name, second.image.name)
+        directory, shard1, shard2, name = first.image.name.split('/')
+        self.assertEqual(directory, 'posts')
+        self.assertEqual(name[:4], shard1 + shard2)
+        self.assertTrue(name.endswith('.gif'))
+        self.assertEqual(
+            StoredFile.objects.get(name=first.image.name).refs, 2
+        )
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл удаляется только вместе с последней ссылкой"""
+        first, second = self.create_post(), self.create_post()
+        name = first.image.name
+        first.delete()
+        self.assertTrue(storage().exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).refs, 1)
+        second.delete()
+        self.assertFalse(storage().exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_replacing_image_moves_reference(self):
+        """Замена картинки переносит ссылку на новый файл"""
+        post = self.create_post()
+        old_name = post.image.name
+        post.image = uploaded(OTHER_GIF)
+        post.save()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(storage().exists(old_name))
+        self.assertEqual(StoredFile.objects.get(name=post.image.name).refs, 1)
+
+    def test_thumbnails_deleted_with_file(self):
+        """Вместе с файлом удаляются его миниатюры и записи kvstore"""
+        post = self.create_post()
+        thumbnails.generate(post.pk)
+        image = thumbnails.ready_card_images([post])[post.pk]
+        names = [
+            thumbnail.name
+            for variants in image.by_format.values()
+            for thumbnail in variants
+        ]
+        self.assertTrue(all(default.storage.exists(name) for name in names))
+        post.delete()
+        self.assertFalse(any(default.storage.exists(name) for name in names))
+        self.assertIsNone(default.kvstore.get(image.fallback))
+
+    def test_reupload_before_cleanup_keeps_file(self):
+        """Загрузка того же файла до удаления без ссылок сохраняет его"""
+        name = self.create_post().image.name
+        callbacks = []
+        with mock.patch(
+            'posts.refcounts.transaction.on_commit', callbacks.append
+        ):
+            Post.objects.get(image=name).delete()
+            self.create_post()
+        for callback in callbacks:
+            callback()
+        self.assertTrue(storage().exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).refs, 1)
@@ -0,0 +1,43 @@
+import io
+
+from django.test import SimpleTestCase
+from PIL import Image
+
+from posts.thumbnail_engine import Engine
+from posts.thumbnails import CARD_OPTIONS, ThumbnailBackend
+
+OPTIONS = {**ThumbnailBackend.default_options, **CARD_OPTIONS,
+           'format': 'JPEG'}
+
+
+def opened_jpeg(size=(2000, 1000)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color=(10, 120, 200)).save(buffer, 'JPEG')
+    return Image.open(io.BytesIO(buffer.getvalue()))
+
+
+class TestThumbnailEngine(SimpleTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.engine = Engine()
+
+    def test_thumbnail_size(self):
+        """Миниатюра получает точный размер геометрии"""
+        thumbnail = self.engine.create(opened_jpeg(), (300, 100), OPTIONS)
+        self.assertEqual(thumbnail.size, (300, 100))
+
+    def test_draft_for_largest_size(self):
+        """JPEG декодируется в масштабе, достаточном для всех размеров"""
+        image = opened_jpeg()
+        self.engine.draft(
+            image, [((320, 113), OPTIONS), ((960, 339), OPTIONS)]
+        )
+        image.load()
+        self.assertEqual(image.size, (1000, 500))
+
+    def test_small_image_not_drafted(self):
+        """Картинка меньше миниатюры декодируется целиком"""
+        image = opened_jpeg((600, 300))
+        self.engine.draft(image, [((960, 339), OPTIONS)])
+        image.load()
+        self.assertEqual(image.size, (600, 300))
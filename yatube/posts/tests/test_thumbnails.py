@@ -0,0 +1,295 @@
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse_lazy
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+
+from posts import thumbnails
+from posts.models import Post
+from posts.templatetags.post_cards import card_key
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def uploaded_gif(name='small.gif', content=SMALL_GIF):
+    return SimpleUploadedFile(
+        name=name, content=content, content_type='image/gif'
+    )
+
+
+def colored_gif(num):
+    buffer = BytesIO()
+    Image.new('RGB', (4, 2), color=(num, 0, 0)).save(buffer, 'GIF')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class TestThumbnails(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(username='ThumbAuthor')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        # Записи kvstore откатываются с транзакцией теста, а файлы
+        # миниатюр того же исходника остаются на диске
+        shutil.rmtree(
+            os.path.join(TEMP_MEDIA_ROOT, sorl_settings.THUMBNAIL_PREFIX),
+            ignore_errors=True
+        )
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.post = Post.objects.create(
+            text='Пост с картинкой', author=self.author, image=uploaded_gif()
+        )
+        self.url = reverse_lazy(
+            'posts:profile', kwargs={'username': self.author.username}
+        )
+
+    def test_placeholder_until_ready(self):
+        """Пока миниатюры нет, выводится заглушка, а создание в очереди"""
+        with mock.patch('posts.thumbnails.queue') as queue:
+            response = self.client.get(self.url)
+        self.assertContains(response, 'thumbnail-pending')
+        self.assertNotContains(response, 'card-img my-2" src=')
+        queue.assert_called_once()
+        self.assertIsNone(
+            cache.get(card_key(self.post)),
+            'Карточка с заглушкой не должна кэшироваться'
+        )
+
+    def test_force_rewrites_files(self):
+        """regenerate с force переписывает и готовые файлы миниатюр"""
+        thumbnails.generate(self.post.pk)
+        image = thumbnails.ready_card_images([self.post])[self.post.pk]
+        path = default.storage.path(image.fallback.name)
+        with open(path, 'wb') as file_:
+            file_.write(b'broken')
+        thumbnails.regenerate(self.post.image.name)
+        with open(path, 'rb') as file_:
+            self.assertEqual(file_.read(), b'broken')
+        thumbnails.regenerate(self.post.image.name, force=True)
+        with Image.open(path) as rewritten:
+            self.assertEqual(list(rewritten.size), image.fallback.size)
+
+    def test_shutdown_waits_for_queue(self):
+        """Остановка процесса дожидается поставленных миниатюр"""
+        with mock.patch(
+            'posts.thumbnails.generate', side_effect=lambda _: time.sleep(0.2)
+        ) as generate:
+            thumbnails._submit((self.post.pk, self.post.image.name))
+            thumbnails.shutdown()
+        generate.assert_called_once_with(self.post.pk)
+
+    def test_generated_thumbnail_is_shown(self):
+        """После генерации карточка выводит <picture> со всеми вариантами"""
+        self.assertEqual(thumbnails.ready_card_images([self.post]), {})
+        thumbnails.generate(self.post.pk)
+        image = thumbnails.ready_card_images([self.post])[self.post.pk]
+        with mock.patch('posts.thumbnails.queue') as queue:
+            response = self.client.get(self.url)
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, image.fallback.url)
+        self.assertContains(response, image.webp_srcset)
+        self.assertContains(response, image.srcset)
+        self.assertNotContains(response, 'thumbnail-pending')
+        queue.assert_not_called()
+
+    @override_settings(CARD_IMAGE_WIDTHS=(320, 640))
+    def test_variants_from_one_decode(self):
+        """Все ширины в WebP и исходном формате из одного декодирования"""
+        with mock.patch.object(
+            default.engine, 'get_image', wraps=default.engine.get_image
+        ) as get_image:
+            thumbnails.generate(self.post.pk)
+        get_image.assert_called_once()
+        image = thumbnails.ready_card_images([self.post])[self.post.pk]
+        self.assertEqual(
+            [thumbnail.width for thumbnail in image.by_format['WEBP']],
+            [320, 640]
+        )
+        self.assertTrue(
+            all(
+                thumbnail.name.endswith('.webp')
+                for thumbnail in image.by_format['WEBP']
+            )
+        )
+        self.assertTrue(
+            all(
+                thumbnail.name.endswith('.gif')
+                for thumbnail in image.by_format[None]
+            )
+        )
+        self.assertEqual(image.fallback.width, 640)
+
+    def test_views_queue_generation(self):
+        """Создание и редактирование поста ставят миниатюры в очередь"""
+        with mock.patch('posts.views.thumbnails.queue') as queue:
+            self.client.post(
+                reverse_lazy('posts:post_create'),
+                {'text': 'Новый пост', 'image': uploaded_gif('new.gif')}
+            )
+            self.client.post(
+                reverse_lazy(
+                    'posts:post_edit', kwargs={'post_id': self.post.pk}
+                ),
+                {'text': 'Исправленный пост', 'image': uploaded_gif('e.gif')}
+            )
+        self.assertEqual(queue.call_count, 2)
+
+    def test_queue_skips_duplicates(self):
+        """Одна и та же картинка ставится в очередь один раз"""
+        with mock.patch(
+            'posts.thumbnails.transaction.on_commit',
+            side_effect=lambda callback: callback()
+        ), mock.patch('posts.thumbnails.get_executor') as get_executor:
+            thumbnails.queue(self.post)
+            thumbnails.queue(self.post)
+        get_executor.return_value.submit.assert_called_once()
+        thumbnails._pending.clear()
+
+    def test_rolled_back_queue_leaves_no_task(self):
+        """После отката задача не остаётся в очереди и не мешает повтору"""
+        with mock.patch('posts.thumbnails.transaction.on_commit'):
+            thumbnails.queue(self.post)
+        self.assertNotIn(
+            (self.post.pk, self.post.image.name), thumbnails._pending
+        )
+
+    def test_page_thumbnails_in_one_lookup(self):
+        """Миниатюры всей страницы читаются из kvstore одним запросом"""
+        for num in range(4):
+            post = Post.objects.create(
+                text=f'Ещё пост {num}',
+                author=self.author,
+                image=uploaded_gif(f'more{num}.gif')
+            )
+            thumbnails.generate(post.pk)
+        thumbnails.generate(self.post.pk)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        kvstore_queries = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        self.assertEqual(response.content.count(b'card-img my-2" src='), 5)
+
+
+class InlineExecutor:
+    """Исполнитель без процессов: тестовая БД не видна дочерним."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def map(self, func, *iterables):
+        return map(func, *iterables)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@mock.patch(
+    'posts.management.commands.regenerate_thumbnails.Command.get_executor',
+    lambda command, max_workers: InlineExecutor()
+)
+class TestRegenerateThumbnails(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(username='RegenerateAuthor')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {num}',
+                author=cls.author,
+                image=uploaded_gif(f'{num}.gif', colored_gif(num))
+            )
+            for num in range(3)
+        ]
+        Post.objects.create(text='Без картинки', author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'checkpoint')
+
+    def test_regenerates_every_image(self):
+        """Команда создаёт варианты для всех постов с картинками"""
+        call_command(
+            'regenerate_thumbnails', batch_size=2,
+            checkpoint=self.checkpoint, stdout=StringIO()
+        )
+        self.assertEqual(
+            set(thumbnails.ready_card_images(self.posts)),
+            {post.pk for post in self.posts}
+        )
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_resumes_from_checkpoint(self):
+        """Посты до контрольной точки пропускаются"""
+        with open(self.checkpoint, 'w') as file_:
+            file_.write(str(self.posts[1].pk))
+        with mock.patch('posts.thumbnails.regenerate') as regenerate:
+            call_command(
+                'regenerate_thumbnails', batch_size=1,
+                checkpoint=self.checkpoint, stdout=StringIO()
+            )
+        regenerate.assert_called_once_with(
+            self.posts[2].image.name, force=False
+        )
+
+    def test_checkpoint_stops_before_failed_batch(self):
+        """Контрольная точка не проходит пачку с ошибкой"""
+        failing = self.posts[1].image.name
+
+        def regenerate(name, force=False):
+            if name == failing:
+                raise OSError('Битый файл')
+
+        with mock.patch('posts.thumbnails.regenerate', regenerate), \
+                self.assertLogs('posts.workers', 'ERROR'):
+            call_command(
+                'regenerate_thumbnails', batch_size=1,
+                checkpoint=self.checkpoint, stdout=StringIO()
+            )
+        self.addCleanup(os.remove, self.checkpoint)
+        with open(self.checkpoint) as file_:
+            self.assertEqual(file_.read(), str(self.posts[0].pk))
@@ -0,0 +1,132 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse_lazy
+
+from posts import views
+from posts.models import Follow, Post, TimelineEntry
+from posts.timeline import TimelineFeed
+
+User = get_user_model()
+
+
+class TestTimeline(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(username='TimelineAuthor')
+        cls.reader = User.objects.create(username='TimelineReader')
+        cls.old_post = Post.objects.create(
+            text='Старый пост',
+            author=cls.author
+        )
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def get_feed(self):
+        response = self.reader_client.get(reverse_lazy('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка дозаполняет ленту, отписка её очищает"""
+        self.reader_client.get(reverse_lazy(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertEqual(self.get_feed(), [self.old_post])
+
+        self.reader_client.get(reverse_lazy(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertEqual(self.get_feed(), [])
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.author_client.post(
+            reverse_lazy('posts:post_create'),
+            data={'text': 'Новый пост'}
+        )
+        new_post = Post.objects.get(text='Новый пост')
+        self.assertEqual(self.get_feed(), [new_post, self.old_post])
+
+    def test_feed_reads_entries_then_posts(self):
+        """Срез ленты берётся из TimelineEntry без JOIN, посты - по id"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            feed = TimelineFeed(self.reader.pk)[0:10]
+        self.assertEqual(feed, [new_post, self.old_post])
+        self.assertEqual(len(queries), 2)
+        self.assertIn('posts_timelineentry', queries[0]['sql'])
+        self.assertNotIn('JOIN', queries[0]['sql'])
+
+    def test_cursor_pages_by_timeline_date(self):
+        """Курсорная лента подписок идёт по дате записей ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for num in range(11):
+            Post.objects.create(text=f'Пост {num}', author=self.author)
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        view = views.FollowIndexView.as_view(
+            template_name='posts/follow.html', cursor_pagination=True
+        )
+
+        def get_page(cursor=None):
+            request = RequestFactory().get(
+                '/', {'cursor': cursor} if cursor else {}
+            )
+            request.user = self.reader
+            return view(request).context_data['page_obj']
+
+        first_page = get_page()
+        second_page = get_page(first_page.next_cursor)
+        self.assertEqual(list(first_page) + list(second_page), expected)
+        self.assertFalse(second_page.has_next())
+
+    def test_cursor_pages_with_several_followers(self):
+        """Пост не повторяется в ленте, если у автора много подписчиков"""
+        for num in range(3):
+            follower = User.objects.create(username=f'Follower{num}')
+            Follow.objects.create(user=follower, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        for num in range(14):
+            Post.objects.create(text=f'Пост {num}', author=self.author)
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        view = views.FollowIndexView.as_view(
+            template_name='posts/follow.html', cursor_pagination=True
+        )
+
+        def get_page(cursor=None):
+            request = RequestFactory().get(
+                '/', {'cursor': cursor} if cursor else {}
+            )
+            request.user = self.reader
+            return view(request).context_data['page_obj']
+
+        first_page = get_page()
+        second_page = get_page(first_page.next_cursor)
+        self.assertEqual(list(first_page) + list(second_page), expected)
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(
+            list(get_page(second_page.previous_cursor)), list(first_page)
+        )
+
+    def test_rebuild_command(self):
+        """Команда rebuild_timelines восстанавливает ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.get_feed(), [self.old_post])
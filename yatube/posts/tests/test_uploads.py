@@ -0,0 +1,124 @@
+import io
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from posts.forms import PostForm
+from posts.uploads import ORIENTATION_TAG
+
+
+def uploaded_jpeg(size, orientation=None, name='photo.jpg'):
+    image = Image.new('RGB', size, color=(200, 30, 30))
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera'
+    if orientation:
+        exif[ORIENTATION_TAG] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+def uploaded_png(size, mode, name='drawing.png'):
+    image = Image.new(mode, size)
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+def uploaded_animation(size, image_format, name):
+    frames = [
+        Image.new('RGB', size, color=color)
+        for color in ((200, 30, 30), (30, 200, 30), (30, 30, 200))
+    ]
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera'
+    buffer = io.BytesIO()
+    frames[0].save(
+        buffer, image_format, save_all=True, append_images=frames[1:],
+        duration=[100, 200, 300], loop=0, exif=exif
+    )
+    return SimpleUploadedFile(
+        name, buffer.getvalue(), f'image/{image_format.lower()}'
+    )
+
+
+def opened(upload):
+    upload.seek(0)
+    return Image.open(io.BytesIO(upload.read()))
+
+
+@override_settings(UPLOAD_MAX_EDGE=400)
+class TestUploads(TestCase):
+    def clean(self, upload):
+        form = PostForm(data={'text': 'Картинка'}, files={'image': upload})
+        return form, form.is_valid()
+
+    def test_downscaled_to_max_edge(self):
+        """Большой оригинал уменьшается до UPLOAD_MAX_EDGE"""
+        form, valid = self.clean(uploaded_jpeg((2000, 1000)))
+        self.assertTrue(valid, form.errors)
+        image = opened(form.cleaned_data['image'])
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (400, 200))
+
+    def test_palette_and_bilevel_png_downscaled(self):
+        """Палитровый и однобитный PNG уменьшаются без reduce()"""
+        for mode in ('P', '1'):
+            with self.subTest(mode=mode):
+                form, valid = self.clean(uploaded_png((1600, 800), mode))
+                self.assertTrue(valid, form.errors)
+                image = opened(form.cleaned_data['image'])
+                self.assertEqual(image.format, 'PNG')
+                self.assertEqual(image.mode, mode)
+                self.assertEqual(image.size, (400, 200))
+
+    def test_animation_downscaled_and_metadata_stripped(self):
+        """Анимация уменьшается покадрово и теряет метаданные"""
+        for image_format, name in (('GIF', 'a.gif'), ('WEBP', 'a.webp')):
+            with self.subTest(image_format=image_format):
+                form, valid = self.clean(
+                    uploaded_animation((1600, 800), image_format, name)
+                )
+                self.assertTrue(valid, form.errors)
+                image = opened(form.cleaned_data['image'])
+                self.assertEqual(image.format, image_format)
+                self.assertEqual(image.size, (400, 200))
+                self.assertEqual(image.n_frames, 3)
+                self.assertEqual(len(image.getexif()), 0)
+                durations = []
+                for frame in range(image.n_frames):
+                    image.seek(frame)
+                    image.load()
+                    durations.append(image.info['duration'])
+                self.assertEqual(durations, [100, 200, 300])
+
+    def test_small_image_keeps_size(self):
+        """Маленькая картинка не растягивается"""
+        form, valid = self.clean(uploaded_jpeg((120, 80)))
+        self.assertTrue(valid, form.errors)
+        self.assertEqual(opened(form.cleaned_data['image']).size, (120, 80))
+
+    def test_orientation_applied_and_metadata_stripped(self):
+        """EXIF-поворот применяется, метаданные не сохраняются"""
+        form, valid = self.clean(uploaded_jpeg((800, 400), orientation=6))
+        self.assertTrue(valid, form.errors)
+        image = opened(form.cleaned_data['image'])
+        self.assertEqual(image.size, (200, 400))
+        self.assertEqual(len(image.getexif()), 0)
+
+    @override_settings(UPLOAD_MAX_PIXELS=10000)
+    def test_too_many_pixels_rejected(self):
+        """Картинка больше лимита пикселей отклоняется по заголовку"""
+        form, valid = self.clean(uploaded_jpeg((200, 100)))
+        self.assertFalse(valid)
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
+    @override_settings(UPLOAD_MAX_BYTES=100)
+    def test_too_large_file_rejected(self):
+        """Файл больше лимита байт отклоняется"""
+        form, valid = self.clean(uploaded_jpeg((200, 100)))
+        self.assertFalse(valid)
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'file_too_large')
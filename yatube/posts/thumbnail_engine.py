@@ -0,0 +1,55 @@
+from math import ceil
+
+from PIL import Image
+from sorl.thumbnail.engines.pil_engine import Engine as PILEngine
+
+# Во сколько раз картинка после reduce() должна оставаться больше
+# итоговой: финальный LANCZOS сглаживает ступеньки reduce()
+REDUCING_GAP = 2
+REDUCIBLE_MODES = ('L', 'LA', 'RGB', 'RGBA', 'CMYK')
+
+
+class Engine(PILEngine):
+    """
+    Pillow-движок sorl, который не декодирует JPEG целиком:
+    draft() выбирает масштаб декодирования 1/2, 1/4 или 1/8
+    под самый крупный нужный размер, затем целочисленный reduce()
+    и только после него финальный ресемплинг.
+    """
+
+    def draft(self, image, sizes):
+        """
+        Включает draft-декодирование под все размеры sizes -
+        пары (геометрия, опции). Работает, пока картинка не загружена.
+        """
+        if image.format != 'JPEG' or image.im is not None:
+            return image
+        if any(options.get('cropbox') for _, options in sizes):
+            return image
+        x_image, y_image = self.get_image_size(image)
+        flip = self.flip_dimensions(image)
+        needed_x = needed_y = 1
+        for geometry, options in sizes:
+            if flip:
+                geometry = geometry[::-1]
+            factor = min(
+                self._calculate_scaling_factor(
+                    x_image, y_image, geometry, options
+                ),
+                1
+            )
+            needed_x = max(needed_x, ceil(x_image * factor))
+            needed_y = max(needed_y, ceil(y_image * factor))
+        image.draft(None, (needed_x, needed_y))
+        return image
+
+    def create(self, image, geometry, options):
+        self.draft(image, [(geometry, options)])
+        return super().create(image, geometry, options)
+
+    def _scale(self, image, width, height):
+        x_image, y_image = image.size
+        factor = int(min(x_image / width, y_image / height) / REDUCING_GAP)
+        if factor >= 2 and image.mode in REDUCIBLE_MODES:
+            image = image.reduce(factor)
+        return image.resize((width, height), resample=Image.LANCZOS)
@@ -0,0 +1,297 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend as SorlThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+from sorl.thumbnail.parsers import parse_geometry
+
+from posts import page_cache
+from posts.models import Post
+
+logger = logging.getLogger(__name__)
+
+# Пропорции картинки карточки и форматы вариантов,
+# None - формат исходного файла
+CARD_RATIO = (960, 339)
+CARD_FORMATS = ('WEBP', None)
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def card_variants():
+    """Пары (геометрия, опции) всех вариантов картинки карточки."""
+    ratio_width, ratio_height = CARD_RATIO
+    return [
+        (
+            f'{width}x{round(width * ratio_height / ratio_width)}',
+            {**CARD_OPTIONS, 'format': format_}
+        )
+        for width in settings.CARD_IMAGE_WIDTHS
+        for format_ in CARD_FORMATS
+    ]
+
+
+class ThumbnailBackend(SorlThumbnailBackend):
+    """
+    Backend sorl, который умеет читать готовые миниатюры
+    из kvstore пачкой и создавать все варианты картинки
+    из одного декодированного исходника.
+    """
+
+    def get_options(self, source, options):
+        """Опции миниатюры так же, как их дополняет get_thumbnail."""
+        options = dict(options)
+        if 'format' in options and options['format'] is None:
+            options['format'] = self._get_format(source)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+    def get_thumbnail_file(self, source, geometry_string, options):
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_ready_thumbnails(self, files, variants):
+        """
+        Готовые миниатюры файлов одним чтением kvstore: для каждого
+        файла список по variants с None для неготовых.
+        """
+        keys = []
+        for file_ in files:
+            source = ImageFile(file_)
+            keys.append([
+                add_prefix(self.get_thumbnail_file(
+                    source, geometry, self.get_options(source, options)
+                ).key)
+                for geometry, options in variants
+            ])
+        values = get_many_raw([key for row in keys for key in row])
+        return [
+            [
+                deserialize_image_file(values[key]) if key in values else None
+                for key in row
+            ]
+            for row in keys
+        ]
+
+    def create_variants(self, file_, variants, force=False):
+        """
+        Создаёт недостающие варианты, декодируя исходник один раз.
+        С force пересоздаёт и готовые. Возвращает миниатюры
+        в порядке variants.
+        """
+        source = ImageFile(file_)
+        thumbnails, missing = [], []
+        for geometry, options in variants:
+            options = self.get_options(source, options)
+            thumbnail = self.get_thumbnail_file(source, geometry, options)
+            cached = None if force else default.kvstore.get(thumbnail)
+            if cached is None:
+                missing.append((thumbnail, geometry, options))
+                thumbnails.append(thumbnail)
+            else:
+                thumbnails.append(cached)
+        if not missing:
+            return thumbnails
+        source_image = default.engine.get_image(source)
+        try:
+            image_info = default.engine.get_image_info(source_image)
+            source.set_size(default.engine.get_image_size(source_image))
+            draft = getattr(default.engine, 'draft', None)
+            if draft is not None:
+                ratio = default.engine.get_image_ratio(
+                    source_image, missing[0][2]
+                )
+                draft(source_image, [
+                    (parse_geometry(geometry, ratio), options)
+                    for _, geometry, options in missing
+                ])
+            for thumbnail, geometry, options in missing:
+                if thumbnail.exists():
+                    if not force:
+                        continue
+                    thumbnail.delete()
+                options['image_info'] = image_info
+                self._create_thumbnail(
+                    source_image, geometry, options, thumbnail
+                )
+        finally:
+            default.engine.cleanup(source_image)
+        default.kvstore.get_or_set(source)
+        for thumbnail, _, _ in missing:
+            default.kvstore.set(thumbnail, source)
+        return thumbnails
+
+
+def get_many_raw(keys):
+    """
+    Пакетный аналог KVStore._get_raw: для cached_db kvstore
+    один get_many к кэшу и один запрос к БД за промахами.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBStore):
+        values = {key: kvstore._get_raw(key) for key in keys}
+        return {key: value for key, value in values.items() if value}
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(
+            KVStoreModel.objects.filter(
+                key__in=missing
+            ).values_list('key', 'value')
+        )
+        loaded = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(loaded, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(loaded)
+    return {
+        key: value for key, value in values.items() if value != EMPTY_VALUE
+    }
+
+
+class CardImage:
+    """Варианты картинки карточки для <picture> и srcset."""
+
+    def __init__(self, thumbnails):
+        self.by_format = defaultdict(list)
+        for (_, options), thumbnail in zip(card_variants(), thumbnails):
+            self.by_format[options['format']].append(thumbnail)
+
+    @staticmethod
+    def get_srcset(thumbnails):
+        return ', '.join(
+            f'{thumbnail.url} {thumbnail.width}w' for thumbnail in thumbnails
+        )
+
+    @property
+    def webp_srcset(self):
+        return self.get_srcset(self.by_format['WEBP'])
+
+    @property
+    def srcset(self):
+        return self.get_srcset(self.by_format[None])
+
+    @property
+    def fallback(self):
+        return self.by_format[None][-1]
+
+
+def ready_card_images(posts):
+    """Картинки карточек, у которых готовы все варианты: {post.pk: ...}."""
+    posts = [post for post in posts if post.image]
+    if not posts:
+        return {}
+    rows = default.backend.get_ready_thumbnails(
+        [post.image for post in posts], card_variants()
+    )
+    return {
+        post.pk: CardImage(thumbnails)
+        for post, thumbnails in zip(posts, rows)
+        if None not in thumbnails
+    }
+
+
+def attach_card_images(posts):
+    """
+    Проставляет постам card_image для шаблона карточки.
+    Неготовые картинки ставятся в очередь.
+    """
+    ready = ready_card_images(posts)
+    for post in posts:
+        post.card_image = ready.get(post.pk)
+        if post.card_image is None and post.image:
+            queue(post)
+
+
+def generate(post_id):
+    """Создаёт все миниатюры поста и сбрасывает страницы с ним."""
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id
+    ).first()
+    if post is None or not post.image:
+        return
+    default.backend.create_variants(post.image, card_variants())
+    page_cache.bump(*page_cache.post_scopes(post))
+
+
+def regenerate(name, force=False):
+    """Создаёт варианты картинки карточки по имени файла в хранилище."""
+    source = ImageFile(name, Post._meta.get_field('image').storage)
+    default.backend.create_variants(source, card_variants(), force=force)
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+            atexit.register(shutdown)
+    return _executor
+
+
+def shutdown():
+    """
+    Дожидается поставленных миниатюр при выходе из процесса:
+    воркер сервера не уйдёт на перезапуск с недописанными файлами.
+    Запросы миниатюр не ждут.
+    """
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def _run(task):
+    try:
+        generate(task[0])
+    except Exception:
+        logger.exception('Не удалось создать миниатюры поста %s', task[0])
+    finally:
+        with _lock:
+            _pending.discard(task)
+        connection.close()
+
+
+def queue(post):
+    """
+    Ставит создание миниатюр поста в очередь локального пула
+    после коммита транзакции. Повторы одной картинки отбрасываются.
+    Задача попадает в _pending только после коммита: при откате
+    она не остаётся там и не закрывает очередь посту с тем же pk.
+    """
+    if not post.image:
+        return
+    task = (post.pk, post.image.name)
+    transaction.on_commit(lambda: _submit(task))
+
+
+def _submit(task):
+    with _lock:
+        if task in _pending:
+            return
+        _pending.add(task)
+    get_executor().submit(_run, task)
@@ -0,0 +1,99 @@
+from django.db import transaction
+
+from posts.models import Follow, Post, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def fan_out(post):
+    """Рассылает новый пост в ленты всех подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def fan_out_posts(post_ids):
+    """Рассылает пачку постов подписчикам их авторов одним чтением."""
+    rows = Post.objects.filter(
+        pk__in=post_ids,
+        author__following__isnull=False
+    ).values_list('author__following__user_id', 'id', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for user_id, post_id, pub_date in rows.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя уже опубликованные посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты читателя посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id
+    ).delete()
+
+
+@transaction.atomic
+def rebuild():
+    """Пересобирает все ленты по текущим подпискам."""
+    TimelineEntry.objects.all().delete()
+    follows = Follow.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        backfill(user_id, author_id)
+
+
+class TimelineFeed:
+    """
+    Лента подписок читателя: срез id постов берётся из TimelineEntry
+    по индексу (user, pub_date), затем посты читаются по первичному
+    ключу. Поддерживает count() и срезы, поэтому подходит для Paginator.
+    """
+    ordered = True
+
+    def __init__(self, user_id):
+        self.entries = TimelineEntry.objects.filter(
+            user_id=user_id
+        ).order_by('-pub_date', '-post_id').values_list('post_id', flat=True)
+
+    def count(self):
+        return self.entries.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        return self.load(self.entries[key])
+
+    def load(self, post_ids):
+        """Посты по списку id в его порядке."""
+        ids = list(post_ids)
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
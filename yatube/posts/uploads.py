@@ -0,0 +1,136 @@
+import io
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageSequence
+
+from .thumbnail_engine import REDUCIBLE_MODES
+
+# Поворот по тегу EXIF Orientation
+ORIENTATION_TAG = 0x0112
+TRANSPOSE = {
+    2: Image.FLIP_LEFT_RIGHT,
+    3: Image.ROTATE_180,
+    4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE,
+    6: Image.ROTATE_270,
+    7: Image.TRANSVERSE,
+    8: Image.ROTATE_90,
+}
+CONTENT_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+
+def open_header(upload):
+    """
+    Открывает картинку лениво: Pillow читает только заголовок,
+    пиксели не декодируются.
+    """
+    if upload.size > settings.UPLOAD_MAX_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)s МБ',
+            code='file_too_large',
+            params={'limit': settings.UPLOAD_MAX_BYTES // 2 ** 20}
+        )
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Не удалось прочитать картинку', code='invalid')
+    if image.format not in settings.UPLOAD_IMAGE_FORMATS:
+        raise ValidationError(
+            'Формат %(format)s не поддерживается',
+            code='invalid_format',
+            params={'format': image.format}
+        )
+    width, height = image.size
+    if width * height > settings.UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка больше %(limit)s мегапикселей',
+            code='too_many_pixels',
+            params={'limit': settings.UPLOAD_MAX_PIXELS // 10 ** 6}
+        )
+    return image
+
+
+def downscale(image, max_edge):
+    """
+    Уменьшает картинку до max_edge по длинной стороне:
+    JPEG декодируется сразу в уменьшенном масштабе (draft),
+    затем целочисленный reduce() и финальный ресемплинг.
+    Палитровые и однобитные картинки reduce() не поддерживает,
+    их уменьшает только thumbnail().
+    """
+    if image.format == 'JPEG':
+        image.draft(None, (max_edge, max_edge))
+    image.load()
+    factor = max(image.size) // max_edge
+    if factor >= 2 and image.mode in REDUCIBLE_MODES:
+        image = image.reduce(factor)
+    if max(image.size) > max_edge:
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    return image
+
+
+def downscale_frames(image, max_edge):
+    """
+    Кадры анимации, уменьшенные до max_edge. Кадры декодируются
+    по одному, в памяти остаются только уменьшенные копии.
+    Палитровые кадры переводятся в RGBA: их палитры у GIF разные.
+    """
+    frames = []
+    for frame in ImageSequence.Iterator(image):
+        frame = frame.convert(
+            frame.mode if frame.mode in REDUCIBLE_MODES else 'RGBA'
+        )
+        if max(frame.size) > max_edge:
+            frame.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        frames.append(frame)
+    return frames
+
+
+def normalize(upload):
+    """
+    Проверяет загрузку по заголовку и пересохраняет её
+    уменьшенной, с учётом EXIF-поворота и без метаданных.
+    Анимации пересохраняются покадрово с прежними длительностями.
+    Память на кадр ограничена UPLOAD_MAX_PIXELS.
+    """
+    image = open_header(upload)
+    image_format = image.format
+    orientation = image.getexif().get(ORIENTATION_TAG)
+    icc_profile = image.info.get('icc_profile')
+    loop = image.info.get('loop', 0)
+    try:
+        if getattr(image, 'is_animated', False):
+            frames = downscale_frames(image, settings.UPLOAD_MAX_EDGE)
+        else:
+            frames = [downscale(image, settings.UPLOAD_MAX_EDGE)]
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Не удалось прочитать картинку', code='invalid')
+    if orientation in TRANSPOSE:
+        frames = [frame.transpose(TRANSPOSE[orientation]) for frame in frames]
+    options = {}
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    if image_format == 'JPEG':
+        options['quality'] = settings.UPLOAD_JPEG_QUALITY
+    if len(frames) > 1:
+        options.update(
+            save_all=True,
+            append_images=frames[1:],
+            duration=[frame.info.get('duration', 0) for frame in frames],
+            loop=loop
+        )
+    buffer = io.BytesIO()
+    frames[0].save(buffer, image_format, **options)
+    name = os.path.basename(upload.name)
+    return SimpleUploadedFile(
+        name, buffer.getvalue(), CONTENT_TYPES[image_format]
+    )
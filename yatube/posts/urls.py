@@ -1,7 +1,10 @@
+from django.conf import settings
 from django.urls import path
-from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
 
 from posts import views
+from posts.page_cache import (conditional_page, post_etag, post_last_modified,
+                              versioned_cache_page)
 
 app_name = 'posts'
 
@@ -16,31 +19,59 @@ urlpatterns = [
         views.UnfollowView.as_view(),
         name='profile_unfollow'
     ),
+    path(
+        'profile/<str:username>/export/',
+        views.ExportView.as_view(),
+        name='profile_export'
+    ),
     path(
         '',
-        cache_page(20, key_prefix='index_page')(
-            views.IndexView.as_view(
-                template_name='posts/index.html')
+        conditional_page(scopes=('index',))(
+            versioned_cache_page(
+                settings.PAGE_CACHE_TIMEOUT,
+                key_prefix='index_page',
+                scopes=('index',)
+            )(
+                views.IndexView.as_view(
+                    template_name='posts/index.html')
+            )
         ),
         name='index'
     ),
     path(
         'group/<slug:slug>/',
-        views.GroupPostView.as_view(
-            template_name='posts/group_list.html'
+        conditional_page(scopes=('group:{slug}',))(
+            versioned_cache_page(
+                settings.PAGE_CACHE_TIMEOUT,
+                key_prefix='group_page',
+                scopes=('group:{slug}',)
+            )(
+                views.GroupPostView.as_view(
+                    template_name='posts/group_list.html')
+            )
         ),
         name='group_list'
     ),
     path(
         'profile/<str:username>/',
-        views.ProfileView.as_view(
-            template_name='posts/profile.html'
+        conditional_page(scopes=('profile:{username}',))(
+            versioned_cache_page(
+                settings.PAGE_CACHE_TIMEOUT,
+                key_prefix='profile_page',
+                scopes=('profile:{username}',)
+            )(
+                views.ProfileView.as_view(
+                    template_name='posts/profile.html')
+            )
         ),
         name='profile'
     ),
     path(
-        'posts/<int:post_id>/', views.PostDetailView.as_view(
-            template_name='posts/post_detail.html'
+        'posts/<int:post_id>/',
+        condition(etag_func=post_etag, last_modified_func=post_last_modified)(
+            views.PostDetailView.as_view(
+                template_name='posts/post_detail.html'
+            )
         ),
         name='post_detail'
     ),
@@ -61,6 +92,12 @@ urlpatterns = [
         ),
         name='add_comment'
     ),
+    path(
+        'search/', views.SearchView.as_view(
+            template_name='posts/search.html'
+        ),
+        name='search'
+    ),
     path(
         'follow/', views.FollowIndexView.as_view(
             template_name='posts/follow.html'
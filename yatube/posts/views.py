@@ -1,13 +1,23 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
+from django.db.models import Max
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
+from django.utils.functional import cached_property
 from django.views.generic import (CreateView, DetailView, ListView,
-                                  RedirectView, UpdateView)
+                                  RedirectView, UpdateView, View)
 
+from posts import exporter, thumbnails
+from posts.feeds import MergedFeed
 from posts.forms import CommentForm, PostForm
-from posts.models import Follow, Group, Post
+from posts.models import AuthorStats, Follow, Group, Post
+from posts.paginators import (CountFreePaginator, CursorPaginator,
+                              InvalidCursor)
+from posts.search import SearchResults
+from posts.timeline import TimelineFeed
 
 User = get_user_model()
 
@@ -15,21 +25,71 @@ User = get_user_model()
 class DataListMixin:
     model = Post
     paginate_by = settings.PER_PAGE
+    # Параметры запроса, от которых зависит страница: остальные
+    # отбрасываются перед кэшированием (page_cache.canonicalize)
+    cache_query_params = ('page', 'cursor')
+    paginator_class = CountFreePaginator
+    cursor_pagination = settings.CURSOR_PAGINATION
+
+    def get_total_count(self):
+        """Доверенный счётчик записей ленты, если он есть."""
+        return None
+
+    def get_total_estimate(self):
+        """Приблизительное число записей для показа."""
+        return None
+
+    def get_paginator(self, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True, **kwargs):
+        return self.paginator_class(
+            queryset,
+            per_page,
+            orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+            count=self.get_total_count(),
+            estimate=self.get_total_estimate(),
+            **kwargs
+        )
+
+    def get_cursor_paginator(self, queryset, page_size):
+        return CursorPaginator(queryset, page_size)
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.cursor_pagination:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = self.get_cursor_paginator(queryset, page_size)
+        try:
+            page = paginator.page(
+                self.request.GET.get(paginator.query_param)
+            )
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
 
 
 class IndexView(DataListMixin, ListView):
 
     def get_queryset(self):
-        return Post.objects.all()
+        return Post.objects.select_related('author', 'group')
+
+    def get_total_estimate(self):
+        return Post.objects.aggregate(estimate=Max('id'))['estimate']
 
 
 class GroupPostView(DataListMixin, ListView):
 
-    def get_object(self):
+    @cached_property
+    def group(self):
         return get_object_or_404(Group, slug=self.kwargs.get('slug'))
 
+    def get_object(self):
+        return self.group
+
+    def get_total_count(self):
+        return self.group.posts_count
+
     def get_queryset(self):
-        return self.get_object().posts.all()
+        return self.get_object().posts.select_related('author', 'group')
 
     def get_context_data(self, **kwargs):
         context = super(GroupPostView, self).get_context_data(**kwargs)
@@ -39,27 +99,38 @@ class GroupPostView(DataListMixin, ListView):
 
 class ProfileView(DataListMixin, ListView):
 
+    @cached_property
+    def author(self):
+        return get_object_or_404(
+            User.objects.select_related('stats'),
+            username=self.kwargs.get('username')
+        )
+
     def get_object(self):
-        return get_object_or_404(User, username=self.kwargs.get('username'))
+        return self.author
+
+    def get_total_count(self):
+        try:
+            return self.author.stats.posts_count
+        except AuthorStats.DoesNotExist:
+            return None
 
     def get_queryset(self):
-        return self.get_object().posts.all()
+        return self.get_object().posts.select_related('author', 'group')
 
     def get_context_data(self, **kwargs):
         context = super(ProfileView, self).get_context_data(**kwargs)
         context['author'] = self.get_object()
-        authenticated = self.request.user.is_authenticated
-        following = authenticated and Follow.objects.filter(
-            user=self.request.user, author=self.get_object()
-        ).exists()
-        context['following'] = following
         return context
 
 
 class PostDetailView(DetailView):
 
     def get_object(self):
-        return get_object_or_404(Post, id=self.kwargs.get('post_id'))
+        return get_object_or_404(
+            Post.objects.select_related('author__stats', 'group'),
+            id=self.kwargs.get('post_id')
+        )
 
     def get_success_url(self):
         post_id = self.kwargs.get('post_id')
@@ -69,11 +140,11 @@ class PostDetailView(DetailView):
         )
 
     def get_comments(self):
-        return self.get_object().comments.all()
+        return self.object.comments.select_related('author')
 
     def get_context_data(self, **kwargs):
         context = super(PostDetailView, self).get_context_data(**kwargs)
-        context['post'] = self.get_object()
+        context['post'] = self.object
         context['form'] = CommentForm()
         context['comments'] = self.get_comments()
         return context
@@ -82,10 +153,12 @@ class PostDetailView(DetailView):
 class PostCreateView(LoginRequiredMixin, CreateView):
     form_class = PostForm
 
+    @transaction.atomic
     def form_valid(self, form):
         post = form.save(commit=False)
         post.author = self.request.user
         post.save()
+        thumbnails.queue(post)
         return super().form_valid(form)
 
     def get_success_url(self):
@@ -104,12 +177,14 @@ class PostEditView(LoginRequiredMixin, UpdateView):
 
     def get_context_data(self, **kwargs):
         context = super(PostEditView, self).get_context_data(**kwargs)
-        context['post'] = self.get_object()
+        context['post'] = self.object
         context['is_edit'] = True
         return context
 
+    @transaction.atomic
     def form_valid(self, form):
-        form.save()
+        post = form.save()
+        thumbnails.queue(post)
         return super().form_valid(form)
 
     def get_success_url(self) -> str:
@@ -122,15 +197,26 @@ class PostEditView(LoginRequiredMixin, UpdateView):
 class CommentView(LoginRequiredMixin, CreateView):
     form_class = CommentForm
 
+    @cached_property
+    def commented_post(self):
+        return get_object_or_404(
+            Post.objects.select_related('author__stats', 'group'),
+            id=self.kwargs.get('post_id')
+        )
+
     def get_object(self):
-        return get_object_or_404(Post, id=self.kwargs.get('post_id'))
+        return self.commented_post
 
     def get_context_data(self, **kwargs):
         context = super(CommentView, self).get_context_data(**kwargs)
-        context['comments'] = self.get_object().comments.all()
+        context['post'] = self.get_object()
+        context['comments'] = self.get_object().comments.select_related(
+            'author'
+        )
         context['form'] = CommentForm()
         return context
 
+    @transaction.atomic
     def form_valid(self, form):
         if form.is_valid():
             comment = form.save(commit=False)
@@ -141,15 +227,15 @@ class CommentView(LoginRequiredMixin, CreateView):
         return self.form_class()
 
     def get_success_url(self):
-        post_id = self.get_object().id
         return reverse_lazy(
             'posts:post_detail',
-            kwargs={'post_id': post_id}
+            kwargs={'post_id': self.kwargs.get('post_id')}
         )
 
 
 class FollowView(LoginRequiredMixin, RedirectView):
 
+    @transaction.atomic
     def get(self, *args, **kwargs):
         if self.kwargs.get('username') == self.request.user.username:
             return redirect(
@@ -180,6 +266,7 @@ class FollowView(LoginRequiredMixin, RedirectView):
 
 class UnfollowView(LoginRequiredMixin, RedirectView):
 
+    @transaction.atomic
     def get(self, *args, **kwargs):
         follower = Follow.objects.filter(
             author__username=self.kwargs.get('username'),
@@ -202,7 +289,55 @@ class UnfollowView(LoginRequiredMixin, RedirectView):
         )
 
 
+class ExportView(LoginRequiredMixin, View):
+    """Потоковая выгрузка своих постов, комментариев и подписок."""
+
+    def get(self, request, *args, **kwargs):
+        if self.kwargs.get('username') != request.user.username:
+            raise Http404('Выгрузка доступна только владельцу')
+        export_format = request.GET.get('format', 'jsonl')
+        if export_format not in exporter.FORMATS:
+            raise Http404(f'Неизвестный формат {export_format}')
+        response = StreamingHttpResponse(
+            exporter.export_lines(request.user, export_format),
+            content_type=exporter.CONTENT_TYPES[export_format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{request.user.username}.{export_format}"'
+        )
+        return response
+
+
 class FollowIndexView(LoginRequiredMixin, DataListMixin, ListView):
 
+    def get_cursor_paginator(self, queryset, page_size):
+        """Курсор листает записи ленты читателя, посты - по id."""
+        return CursorPaginator(
+            queryset.entries, page_size,
+            key_field='post_id', load=queryset.load
+        )
+
     def get_queryset(self):
-        return Post.objects.filter(author__following__user=self.request.user)
+        if self.cursor_pagination or settings.FOLLOW_FEED_ENGINE != 'merge':
+            return TimelineFeed(self.request.user.pk)
+        return MergedFeed(
+            Follow.objects.filter(
+                user=self.request.user
+            ).values_list('author_id', flat=True)
+        )
+
+
+class SearchView(DataListMixin, ListView):
+    cursor_pagination = False
+    cache_query_params = ('q', 'page')
+
+    def get_search_query(self):
+        return self.request.GET.get('q', '').strip()
+
+    def get_queryset(self):
+        return SearchResults(self.get_search_query())
+
+    def get_context_data(self, **kwargs):
+        context = super(SearchView, self).get_context_data(**kwargs)
+        context['query'] = self.get_search_query()
+        return context
@@ -0,0 +1,22 @@
+import logging
+
+import django
+
+logger = logging.getLogger(__name__)
+
+# Функции для пула процессов (spawn). Модуль импортируется в дочернем
+# процессе до django.setup(), поэтому модели загружаются внутри функций
+
+
+def init_worker():
+    django.setup()
+
+
+def regenerate_thumbnails(name, force=False):
+    from posts import thumbnails
+    try:
+        thumbnails.regenerate(name, force=force)
+    except Exception:
+        logger.exception('Не удалось пересоздать миниатюры %s', name)
+        return False
+    return True
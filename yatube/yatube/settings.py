@@ -28,6 +28,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -107,10 +108,85 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 PER_PAGE = 10
 
+# Курсорная пагинация лент вместо OFFSET-пагинации
+CURSOR_PAGINATION = False
+
+# Движок ленты подписок: 'timeline' (fan-out on write)
+# или 'merge' (слияние закэшированных списков авторов)
+FOLLOW_FEED_ENGINE = 'timeline'
+AUTHOR_FEED_SIZE = 100
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Страницы лент сбрасываются сигналами, поэтому живут долго
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Страницы гостей кэшируются целиком до сессий и ORM. Страница
+# с областями page_cache живёт PAGE_CACHE_TIMEOUT, без них -
+# ANON_PAGE_CACHE_TIMEOUT; браузеру разрешено хранить ANON_PAGE_MAX_AGE.
+# Помимо cookie сессии кэш обходят запросы с cookie из SKIP_COOKIES
+ANON_PAGE_CACHE_NAMESPACES = ('posts', 'about')
+ANON_PAGE_CACHE_SKIP_COOKIES = ('messages',)
+ANON_PAGE_CACHE_TIMEOUT = 60 * 5
+ANON_PAGE_MAX_AGE = 60
+
+# Защита от лавины пересчётов: устаревшую запись пересчитывает
+# владелец блокировки, остальные получают прежнюю ещё до
+# SINGLE_FLIGHT_STALE_TIMEOUT секунд после срока или, если её нет,
+# ждут до SINGLE_FLIGHT_WAIT секунд. BETA - коэффициент
+# вероятностного досрочного пересчёта
+SINGLE_FLIGHT_LOCK_TIMEOUT = 30
+SINGLE_FLIGHT_WAIT = 5
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05
+SINGLE_FLIGHT_STALE_TIMEOUT = 60 * 5
+SINGLE_FLIGHT_BETA = 1.0
+
+# Карточки постов кэшируются по хэшу содержимого и не требуют сброса
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Ограничения загружаемых картинок: проверяются по заголовку,
+# оригинал уменьшается до UPLOAD_MAX_EDGE по длинной стороне
+UPLOAD_MAX_BYTES = 10 * 2 ** 20
+UPLOAD_MAX_PIXELS = 40 * 10 ** 6
+UPLOAD_MAX_EDGE = 2048
+UPLOAD_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+UPLOAD_JPEG_QUALITY = 90
+
+# Миниатюры создаются в фоне локальным пулом потоков
+THUMBNAIL_BACKEND = 'posts.thumbnails.ThumbnailBackend'
+THUMBNAIL_ENGINE = 'posts.thumbnail_engine.Engine'
+THUMBNAIL_WORKERS = 2
+# Ширины вариантов картинки карточки по возрастанию,
+# каждая создаётся в WebP и в формате исходника
+CARD_IMAGE_WIDTHS = (320, 640, 960)
+
+# Двухуровневый кэш: L1 в памяти процесса для ключей, значение
+# под которыми не меняется, поверх общего для всех процессов L2.
+# Вместо файлового L2 можно указать Memcached или Redis
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TwoTierCache',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_MAX_ENTRIES': 1000,
+            'L1_MAX_BYTES': 32 * 2 ** 20,
+            'L1_TIMEOUT': 60 * 5,
+            'L1_KEY_PREFIXES': (
+                'post_card:',
+                'anon_page:',
+            ),
+            'SYNC_INTERVAL': 1,
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache.FileCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
 }
+
+# manage.py test держит общий кэш во временном каталоге,
+# pytest - фикстурой из conftest.py в корне репозитория
+TEST_RUNNER = 'core.test_runner.TempCacheRunner'